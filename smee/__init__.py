@@ -2,7 +2,13 @@
 
 import importlib.metadata
 
-from ._constants import CUTOFF_ATTRIBUTE, SWITCH_ATTRIBUTE, EnergyFn, PotentialType
+from ._constants import (
+    CUTOFF_ATTRIBUTE,
+    NON_PERIODIC_CUTOFF_ATTRIBUTE,
+    SWITCH_ATTRIBUTE,
+    EnergyFn,
+    PotentialType,
+)
 from ._models import (
     NonbondedParameterMap,
     ParameterMap,
@@ -16,7 +22,12 @@ from ._models import (
     VSiteMap,
 )
 from .geometry import add_v_site_coords, compute_v_site_coords
-from .potentials import compute_energy, compute_energy_potential
+from .potentials import compile_energy, compute_energy, compute_energy_potential
+
+# isort: split
+# register the built-in potential energy functions
+import smee.potentials.nonbonded  # noqa: F401
+import smee.potentials.valence  # noqa: F401
 
 try:
     __version__ = importlib.metadata.version("smee")
@@ -25,6 +36,7 @@ except importlib.metadata.PackageNotFoundError:
 
 __all__ = [
     "CUTOFF_ATTRIBUTE",
+    "NON_PERIODIC_CUTOFF_ATTRIBUTE",
     "SWITCH_ATTRIBUTE",
     "EnergyFn",
     "PotentialType",
@@ -41,6 +53,7 @@ __all__ = [
     "__version__",
     "add_v_site_coords",
     "compute_v_site_coords",
+    "compile_energy",
     "compute_energy",
     "compute_energy_potential",
 ]
@@ -58,6 +58,14 @@ class EnergyFn(_StrEnum):
 
 CUTOFF_ATTRIBUTE = "cutoff"
 """The attribute that should be used to store the cutoff distance of a potential."""
+NON_PERIODIC_CUTOFF_ATTRIBUTE = "non_periodic_cutoff"
+"""The attribute that should be used to store the cutoff distance of a potential when
+it is evaluated for a non-periodic system.
+
+This attribute should be omitted if all pairs of particles should interact in
+non-periodic systems. It is currently only respected when evaluating energies using
+``smee`` directly, and not when converting to OpenMM.
+"""
 SWITCH_ATTRIBUTE = "switch_width"
 """The attribute that should be used to store the switch width of a potential, if the
 potential should use the standard OpenMM switch function.
@@ -8,12 +8,15 @@ import openff.interchange.models
 import openff.units
 import torch
 
+import smee.utils
+
 _ANGSTROM = openff.units.unit.angstrom
 _RADIANS = openff.units.unit.radians
 
 
 DeviceType = typing.Literal["cpu", "cuda"]
 Precision = typing.Literal["single", "double"]
+PairPrecision = typing.Literal["bfloat16", "float16"]
 
 
 def _cast(
@@ -36,6 +39,39 @@ def _cast(
     return tensor.to(device=device, dtype=dtype)
 
 
+def _compute_parameter_idxs(assignment_matrix: torch.Tensor) -> torch.Tensor | None:
+    """Find the index of the parameter assigned to each row of an assignment matrix.
+
+    Args:
+        assignment_matrix: The (possibly sparse) assignment matrix with
+            ``shape=(n_rows, n_parameters)``.
+
+    Returns:
+        The index of the parameter assigned to each row with ``shape=(n_rows,)``, or
+        ``None`` if any row is not assigned exactly one parameter with a weight of one.
+    """
+
+    if assignment_matrix.is_sparse:
+        assignment_matrix = assignment_matrix.coalesce()
+
+        row_idxs, col_idxs = assignment_matrix.indices()
+        values = assignment_matrix.values()
+    else:
+        row_idxs, col_idxs = assignment_matrix.nonzero(as_tuple=True)
+        values = assignment_matrix[row_idxs, col_idxs]
+
+    n_rows = assignment_matrix.shape[0]
+
+    if (
+        len(row_idxs) != n_rows
+        or not (values == 1).all()
+        or not (row_idxs == torch.arange(n_rows, device=row_idxs.device)).all()
+    ):
+        return None
+
+    return col_idxs
+
+
 @dataclasses.dataclass
 class ValenceParameterMap:
     """A map between atom indices part of a particular valence interaction (e.g.
@@ -51,6 +87,29 @@ class ValenceParameterMap:
     corresponding handler parameters, with ``shape=(n_interacting, n_parameters)``.
     """
 
+    _parameter_idxs: tuple[torch.Tensor, torch.Tensor | None] | None = (
+        dataclasses.field(default=None, init=False, repr=False, compare=False)
+    )
+
+    @property
+    def parameter_idxs(self) -> torch.Tensor | None:
+        """The index of the parameter assigned to each interaction with
+        ``shape=(n_interacting,)``, or ``None`` if any interaction is not assigned
+        exactly one parameter with a weight of one.
+
+        This is cached until ``assignment_matrix`` is replaced.
+        """
+        if (
+            self._parameter_idxs is None
+            or self._parameter_idxs[0] is not self.assignment_matrix
+        ):
+            self._parameter_idxs = (
+                self.assignment_matrix,
+                _compute_parameter_idxs(self.assignment_matrix),
+            )
+
+        return self._parameter_idxs[1]
+
     def to(
         self, device: DeviceType | None = None, precision: Precision | None = None
     ) -> "ValenceParameterMap":
@@ -81,6 +140,59 @@ class NonbondedParameterMap:
     with ``shape=(n_exclusions, 1)``.
     """
 
+    _parameter_idxs: tuple[torch.Tensor, torch.Tensor | None] | None = (
+        dataclasses.field(default=None, init=False, repr=False, compare=False)
+    )
+    _exclusions_upper_tri_idx: tuple[torch.Tensor, int, torch.Tensor] | None = (
+        dataclasses.field(default=None, init=False, repr=False, compare=False)
+    )
+
+    @property
+    def parameter_idxs(self) -> torch.Tensor | None:
+        """The index of the parameter assigned to each particle with
+        ``shape=(n_particles,)``, or ``None`` if any particle is not assigned exactly
+        one parameter with a weight of one (e.g. when using charge increments).
+
+        This is cached until ``assignment_matrix`` is replaced.
+        """
+        if (
+            self._parameter_idxs is None
+            or self._parameter_idxs[0] is not self.assignment_matrix
+        ):
+            self._parameter_idxs = (
+                self.assignment_matrix,
+                _compute_parameter_idxs(self.assignment_matrix),
+            )
+
+        return self._parameter_idxs[1]
+
+    @property
+    def exclusions_upper_tri_idx(self) -> torch.Tensor:
+        """The index of each exclusion in the flattened upper triangular matrix of
+        all pairs of particles with ``shape=(n_exclusions,)``, as used by
+        ``smee.potentials.nonbonded.compute_pairwise_scales``.
+
+        This is cached until ``exclusions`` or ``assignment_matrix`` is replaced.
+        """
+        n_particles = self.assignment_matrix.shape[0]
+
+        if (
+            self._exclusions_upper_tri_idx is None
+            or self._exclusions_upper_tri_idx[0] is not self.exclusions
+            or self._exclusions_upper_tri_idx[1] != n_particles
+        ):
+            exclusions, _ = self.exclusions.sort(dim=1)  # ensure upper triangle
+
+            self._exclusions_upper_tri_idx = (
+                self.exclusions,
+                n_particles,
+                smee.utils.to_upper_tri_idx(
+                    exclusions[:, 0], exclusions[:, 1], n_particles
+                ),
+            )
+
+        return self._exclusions_upper_tri_idx[2]
+
     def to(
         self, device: DeviceType | None = None, precision: Precision | None = None
     ) -> "NonbondedParameterMap":
@@ -314,6 +426,27 @@ class TensorPotential:
     such exceptions, and these are predominantly useful for non-bonded potentials.
     """
 
+    pair_precision: PairPrecision | None = None
+    """The reduced precision to evaluate the energy of each pair of particles in, or
+    ``None`` to use the precision of the parameters.
+
+    The energies of each pair are always summed in the precision of the parameters,
+    and for Lennard-Jones potentials only ``(sigma / r)^6`` is evaluated in the reduced
+    precision, as the full energy of close pairs can overflow it. Its gradient is
+    always evaluated in the precision of the parameters for the same reason. This is
+    currently only supported by the Lennard-Jones and (non-periodic) Coulomb
+    potentials, and is ignored by all other potentials.
+
+    The memory bandwidth of the pair terms is only reduced when the energy kernels
+    are compiled (i.e. ``SMEE_COMPILE=1``), such that the casts are fused. Otherwise,
+    each cast materializes an extra copy of each pair term, which increases memory
+    traffic rather than halving it.
+    """
+
+    _pme_exclusion_coeffs: tuple[tuple, tuple, torch.Tensor, torch.Tensor] | None = (
+        dataclasses.field(default=None, init=False, repr=False, compare=False)
+    )
+
     def to(
         self, device: DeviceType | None = None, precision: Precision | None = None
     ) -> "TensorPotential":
@@ -333,6 +466,7 @@ class TensorPotential:
             self.attribute_cols,
             self.attribute_units,
             self.exceptions,
+            self.pair_precision,
         )
 
 
@@ -116,6 +116,7 @@ def _unpack_force_field(
             attributes=attributes,
             attribute_cols=original_potential.attribute_cols,
             attribute_units=original_potential.attribute_units,
+            pair_precision=original_potential.pair_precision,
         )
         potentials.append(potential)
 
@@ -4,6 +4,7 @@ from smee.potentials._potentials import (
     broadcast_exceptions,
     broadcast_idxs,
     broadcast_parameters,
+    compile_energy,
     compute_energy,
     compute_energy_potential,
     potential_energy_fn,
@@ -13,6 +14,7 @@ __all__ = [
     "broadcast_exceptions",
     "broadcast_idxs",
     "broadcast_parameters",
+    "compile_energy",
     "compute_energy",
     "compute_energy_potential",
     "potential_energy_fn",
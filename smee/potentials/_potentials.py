@@ -1,6 +1,5 @@
 """Compute the potential energy of parameterized systems / topologies."""
 
-import importlib
 import inspect
 import typing
 
@@ -14,6 +13,11 @@ if typing.TYPE_CHECKING:
 
 
 _POTENTIAL_ENERGY_FUNCTIONS = {}
+_POTENTIAL_ENERGY_FN_KWARGS: dict[tuple[str, str], frozenset[str]] = {}
+"""The optional keyword arguments (e.g. ``box_vectors``) accepted by each registered
+potential energy function, found once when the function is registered."""
+
+_OPTIONAL_ENERGY_FN_KWARGS = frozenset({"box_vectors", "pairwise"})
 
 
 def potential_energy_fn(handler_type: str, energy_expression: str):
@@ -28,6 +32,9 @@ def potential_energy_fn(handler_type: str, energy_expression: str):
             )
 
         _POTENTIAL_ENERGY_FUNCTIONS[(handler_type, energy_expression)] = func
+        _POTENTIAL_ENERGY_FN_KWARGS[(handler_type, energy_expression)] = frozenset(
+            _OPTIONAL_ENERGY_FN_KWARGS & inspect.signature(func).parameters.keys()
+        )
         return func
 
     return _potential_function_inner
@@ -48,28 +55,34 @@ def broadcast_parameters(
         ``shape=(n_parameters, n_parameter_cols)``.
     """
 
-    parameters = []
+    n_cols = len(potential.parameter_cols)
 
-    for topology, n_copies in zip(system.topologies, system.n_copies, strict=True):
-        parameter_map = topology.parameters[potential.type]
+    if len(system.topologies) == 0:
+        return torch.zeros((0, n_cols))
 
-        topology_parameters = parameter_map.assignment_matrix @ potential.parameters
+    parameter_maps = [
+        topology.parameters[potential.type] for topology in system.topologies
+    ]
+    parameter_idxs = [parameter_map.parameter_idxs for parameter_map in parameter_maps]
 
-        n_interactions = len(topology_parameters)
-        n_cols = len(potential.parameter_cols)
+    if all(idxs is not None for idxs in parameter_idxs):
+        # each interaction is assigned exactly one parameter, so the parameters can be
+        # gathered directly rather than computed by a matrix multiplication
+        system_idxs = torch.cat(
+            [
+                idxs.repeat(n_copies)
+                for idxs, n_copies in zip(parameter_idxs, system.n_copies, strict=True)
+            ]
+        )
+        return potential.parameters[system_idxs]
 
-        topology_parameters = torch.broadcast_to(
-            topology_parameters[None, :, :],
-            (n_copies, n_interactions, n_cols),
-        ).reshape(-1, n_cols)
+    parameters = []
 
-        parameters.append(topology_parameters)
+    for parameter_map, n_copies in zip(parameter_maps, system.n_copies, strict=True):
+        topology_parameters = parameter_map.assignment_matrix @ potential.parameters
+        parameters.append(topology_parameters.repeat(n_copies, 1))
 
-    return (
-        torch.zeros((0, len(potential.parameter_cols)))
-        if len(parameters) == 0
-        else torch.vstack(parameters)
-    )
+    return torch.cat(parameters)
 
 
 def broadcast_exceptions(
@@ -103,17 +116,14 @@ def broadcast_exceptions(
         if isinstance(parameter_map, smee.ValenceParameterMap):
             raise NotImplementedError("valence exceptions are not supported")
 
-        # check that each particle is assigned to exactly one parameter
-        assignment_dense = parameter_map.assignment_matrix.to_dense()
+        assigned_idxs = parameter_map.parameter_idxs
 
-        if not (assignment_dense.abs().sum(axis=-1) == 1).all():
+        if assigned_idxs is None:
             raise NotImplementedError(
                 f"exceptions can only be used when each particle is assigned exactly "
                 f"one {potential.type} parameter"
             )
 
-        assigned_idxs = assignment_dense.argmax(axis=-1)
-
         n_particles = len(assigned_idxs)
 
         assigned_idxs = torch.broadcast_to(
@@ -215,8 +225,10 @@ def _prepare_inputs(
         vectors (if present) with ``dtype=float32``.
     """
 
-    conformer = conformer.float()
-    box_vectors = box_vectors.float() if box_vectors is not None else None
+    if conformer.dtype != torch.float32:
+        conformer = conformer.float()
+    if box_vectors is not None and box_vectors.dtype != torch.float32:
+        box_vectors = box_vectors.float()
 
     if isinstance(system, smee.TensorTopology):
         system = smee.TensorSystem([system], [1], False)
@@ -255,11 +267,24 @@ def _precompute_pairwise(
     requires_pairwise = False
     cutoffs = []
 
+    non_periodic_cutoffs = []
+
     for potential in force_field.potentials:
-        energy_fn = _POTENTIAL_ENERGY_FUNCTIONS[(potential.type, potential.fn)]
-        energy_fn_spec = inspect.signature(energy_fn)
+        energy_fn_kwargs = _POTENTIAL_ENERGY_FN_KWARGS[(potential.type, potential.fn)]
+
+        if "pairwise" not in energy_fn_kwargs:
+            continue
 
-        if "pairwise" not in energy_fn_spec.parameters:
+        if not system.is_periodic:
+            non_periodic_cutoffs.append(
+                None
+                if smee.NON_PERIODIC_CUTOFF_ATTRIBUTE not in potential.attribute_cols
+                else potential.attributes[
+                    potential.attribute_cols.index(smee.NON_PERIODIC_CUTOFF_ATTRIBUTE)
+                ]
+            )
+
+        if requires_pairwise:
             continue
 
         requires_pairwise = True
@@ -270,8 +295,6 @@ def _precompute_pairwise(
             ]
             cutoffs.append(cutoff)
 
-        break
-
     if not requires_pairwise:
         return
 
@@ -279,9 +302,26 @@ def _precompute_pairwise(
         return
 
     cutoff = None if len(cutoffs) == 0 else cutoffs[0]
+    non_periodic_cutoff = None
+
+    if len(non_periodic_cutoffs) > 0:
+        non_periodic_cutoff = non_periodic_cutoffs[0]
+
+        if any(
+            (other is None) != (non_periodic_cutoff is None)
+            or (other is not None and not torch.isclose(other, non_periodic_cutoff))
+            for other in non_periodic_cutoffs
+        ):
+            # each potential will compute its own distances
+            return
+
+        if non_periodic_cutoff is not None and conformer.ndim == 3:
+            # the pairs within the cutoff differ between frames, and so each potential
+            # will evaluate one frame at a time
+            return
 
     return smee.potentials.nonbonded.compute_pairwise(
-        system, conformer, box_vectors, cutoff
+        system, conformer, box_vectors, cutoff, non_periodic_cutoff
     )
 
 
@@ -309,20 +349,31 @@ def compute_energy_potential(
         The potential energy of the conformer(s) [kcal / mol].
     """
 
-    # register the built-in potential energy functions
-    importlib.import_module("smee.potentials.nonbonded")
-    importlib.import_module("smee.potentials.valence")
-
     system, conformer, box_vectors = _prepare_inputs(system, conformer, box_vectors)
 
     energy_fn = _POTENTIAL_ENERGY_FUNCTIONS[(potential.type, potential.fn)]
-    energy_fn_spec = inspect.signature(energy_fn)
+    energy_fn_spec = _POTENTIAL_ENERGY_FN_KWARGS[(potential.type, potential.fn)]
+
+    return _compute_energy_potential(
+        energy_fn, energy_fn_spec, system, potential, conformer, box_vectors, pairwise
+    )
+
 
+def _compute_energy_potential(
+    energy_fn: typing.Callable[..., torch.Tensor],
+    energy_fn_spec: frozenset[str],
+    system: smee.TensorSystem,
+    potential: smee.TensorPotential,
+    conformer: torch.Tensor,
+    box_vectors: torch.Tensor | None,
+    pairwise: typing.Optional["smee.potentials.nonbonded.PairwiseDistances"],
+) -> torch.Tensor:
+    """Calls a potential energy function with the optional arguments it accepts."""
     energy_fn_kwargs = {}
 
-    if "box_vectors" in energy_fn_spec.parameters:
+    if "box_vectors" in energy_fn_spec:
         energy_fn_kwargs["box_vectors"] = box_vectors
-    if "pairwise" in energy_fn_spec.parameters:
+    if "pairwise" in energy_fn_spec:
         energy_fn_kwargs["pairwise"] = pairwise
 
     return energy_fn(system, potential, conformer, **energy_fn_kwargs)
@@ -349,20 +400,134 @@ def compute_energy(
         The potential energy of the conformer(s) [kcal / mol].
     """
 
-    # register the built-in potential energy functions
-    importlib.import_module("smee.potentials.nonbonded")
-    importlib.import_module("smee.potentials.valence")
-
     system, conformer, box_vectors = _prepare_inputs(system, conformer, box_vectors)
+
+    energy_fns = [
+        (
+            _POTENTIAL_ENERGY_FUNCTIONS[(potential.type, potential.fn)],
+            _POTENTIAL_ENERGY_FN_KWARGS[(potential.type, potential.fn)],
+        )
+        for potential in force_field.potentials
+    ]
+    return _compute_energy(system, force_field, energy_fns, conformer, box_vectors)
+
+
+def _compute_energy(
+    system: smee.TensorSystem,
+    force_field: smee.TensorForceField,
+    energy_fns: list[tuple[typing.Callable[..., torch.Tensor], frozenset[str]]],
+    conformer: torch.Tensor,
+    box_vectors: torch.Tensor | None,
+) -> torch.Tensor:
+    """Sums the energy of each potential in a force field, using the already resolved
+    energy function (and its optional arguments) of each potential."""
     pairwise = _precompute_pairwise(system, force_field, conformer, box_vectors)
 
     energy = smee.utils.zeros_like(
         conformer.shape[0] if conformer.ndim == 3 else 1, conformer
     )
 
-    for potential in force_field.potentials:
-        energy += compute_energy_potential(
-            system, potential, conformer, box_vectors, pairwise
+    if len(force_field.potentials) == 0:
+        return energy
+
+    # reduce all terms at once rather than accumulating them one at a time, yielding a
+    # single node in the autograd graph
+    energies = [
+        _compute_energy_potential(
+            energy_fn,
+            energy_fn_spec,
+            system,
+            potential,
+            conformer,
+            box_vectors,
+            pairwise,
         )
+        for potential, (energy_fn, energy_fn_spec) in zip(
+            force_field.potentials, energy_fns, strict=True
+        )
+    ]
+    energy += torch.stack(
+        [torch.broadcast_to(term, energy.shape) for term in energies]
+    ).sum(dim=0)
 
     return energy
+
+
+def compile_energy(
+    system: smee.TensorSystem | smee.TensorTopology,
+    force_field: smee.TensorForceField,
+    cuda_graphs: bool = False,
+) -> typing.Callable[[torch.Tensor, torch.Tensor | None], torch.Tensor]:
+    """Specializes and compiles the potential energy function of a system / topology
+    for a fixed force field, e.g. for simulations or minimizations where only the
+    conformer changes between evaluations.
+
+    The energy function of each potential is looked up once and compiled with
+    ``torch.compile``, while the cheap summation of the energy terms is left to run
+    eagerly so that each function is only traced for the potentials that use it.
+
+    Notes:
+        * The returned function does not support double backward, i.e. it can be
+          used to compute forces but not their gradient with respect to the force
+          field parameters.
+        * Changes to the structure of the system or force field after calling this
+          function are not reflected in the returned function.
+        * When ``cuda_graphs`` is enabled, the energies (and their gradients) returned
+          by one call are overwritten by the next call, and so must be cloned if they
+          need to be kept.
+
+    Args:
+        system: The system or topology to compute the potential energy of.
+        force_field: The force field that defines the potential energy function.
+        cuda_graphs: Whether to capture the compiled kernels (both the forward and
+            backward passes) into CUDA graphs that are replayed on subsequent calls,
+            removing the kernel launch overhead that dominates for small systems.
+            Only the parts of each energy function that do not synchronize with the
+            host are captured, and this has no effect for tensors on the CPU.
+
+    Returns:
+        A function that accepts the conformer(s) to evaluate the potential at with
+        ``shape=(n_particles, 3)`` or ``shape=(n_confs, n_particles, 3)``, and the box
+        vectors of the system with ``shape=(3, 3)`` if the system is periodic or
+        ``None`` otherwise, and that returns the potential energy of the conformer(s)
+        [kcal / mol].
+    """
+    if isinstance(system, smee.TensorTopology):
+        system = smee.TensorSystem([system], [1], False)
+
+    for topology in system.topologies:
+        for parameter_map in topology.parameters.values():
+            # populate the cached parameter indices eagerly, as finding them requires
+            # sparse tensor ops that cannot be compiled
+            _ = parameter_map.parameter_idxs
+
+            if isinstance(parameter_map, smee.NonbondedParameterMap):
+                _ = parameter_map.exclusions_upper_tri_idx
+
+    compiled_fns = {}
+    energy_fns = []
+
+    for potential in force_field.potentials:
+        key = (potential.type, potential.fn)
+
+        if key not in compiled_fns:
+            compiled_fns[key] = torch.compile(
+                _POTENTIAL_ENERGY_FUNCTIONS[key],
+                dynamic=False,
+                fullgraph=False,
+                mode="reduce-overhead" if cuda_graphs else None,
+            )
+
+        energy_fns.append((compiled_fns[key], _POTENTIAL_ENERGY_FN_KWARGS[key]))
+
+    def _energy_fn(
+        conformer: torch.Tensor, box_vectors: torch.Tensor | None = None
+    ) -> torch.Tensor:
+        if cuda_graphs:
+            # each call is a new step, allowing the graph memory to be re-used
+            torch.compiler.cudagraph_mark_step_begin()
+
+        _, conformer, box_vectors = _prepare_inputs(system, conformer, box_vectors)
+        return _compute_energy(system, force_field, energy_fns, conformer, box_vectors)
+
+    return _energy_fn
@@ -1,21 +1,17 @@
 """Non-bonded potential energy functions."""
 
-import collections
+import functools
 import math
 import typing
 
-import openff.units
 import torch
 
 import smee.potentials
 import smee.utils
 
-_UNIT = openff.units.unit
-
-_COULOMB_PRE_FACTOR_UNITS = _UNIT.kilocalorie / _UNIT.mole * _UNIT.angstrom / _UNIT.e**2
-_COULOMB_PRE_FACTOR = (_UNIT.avogadro_constant / (4.0 * _UNIT.pi * _UNIT.eps0)).m_as(
-    _COULOMB_PRE_FACTOR_UNITS
-)
+_COULOMB_PRE_FACTOR = 332.0637130744615
+"""The Coulomb pre-factor N_A / (4 pi eps0) [kcal / mol Å / e^2], as computed by
+``openff.units`` (i.e. pint)."""
 
 _PME_MIN_NODES = torch.tensor(6)  # taken to match OpenMM 8.0.0
 _PME_ORDER = 5  # see OpenMM issue #2567
@@ -35,6 +31,10 @@ class PairwiseDistances(typing.NamedTuple):
     cutoff: torch.Tensor | None = None
     """The cutoff used when computing the distances."""
 
+    all_pairs: bool = False
+    """Whether ``idxs`` contains every pair of particles in the (flattened) upper
+    triangular order returned by ``torch.triu_indices``."""
+
 
 def _broadcast_exclusions(
     system: smee.TensorSystem, potential: smee.TensorPotential
@@ -51,15 +51,39 @@ def _broadcast_exclusions(
         with shape ``(n_exceptions,)``.
     """
 
-    idx_offset = 0
+    n_exclusions = sum(
+        n_copies * len(topology.parameters[potential.type].exclusions)
+        for topology, n_copies in zip(system.topologies, system.n_copies, strict=True)
+    )
+
+    if n_exclusions == 0:
+        return (
+            torch.zeros((0, 2), dtype=torch.int32),
+            torch.zeros((0,), dtype=torch.float32),
+        )
+
+    reference_idxs = next(
+        topology.parameters[potential.type].exclusions
+        for topology in system.topologies
+        if len(topology.parameters[potential.type].exclusions) > 0
+    )
 
-    per_topology_exclusion_idxs = []
-    per_topology_exclusion_scales = []
+    system_idxs = torch.empty(
+        (n_exclusions, 2), dtype=reference_idxs.dtype, device=reference_idxs.device
+    )
+    system_scales = torch.empty(
+        (n_exclusions,),
+        dtype=potential.attributes.dtype,
+        device=potential.attributes.device,
+    )
+
+    idx_offset = 0
+    exclusion_offset = 0
 
     for topology, n_copies in zip(system.topologies, system.n_copies, strict=True):
         exclusion_idxs = topology.parameters[potential.type].exclusions
 
-        exclusion_offset = (
+        particle_offset = (
             idx_offset
             + smee.utils.arange_like(n_copies, exclusion_idxs) * topology.n_particles
         )
@@ -68,30 +92,48 @@ def _broadcast_exclusions(
         if len(exclusion_idxs) == 0:
             continue
 
-        exclusion_idxs = exclusion_offset[:, None, None] + exclusion_idxs[None, :, :]
+        n_topology_exclusions = n_copies * len(exclusion_idxs)
+        system_slice = slice(exclusion_offset, exclusion_offset + n_topology_exclusions)
+        exclusion_offset += n_topology_exclusions
 
-        exclusion_scales = potential.attributes[
-            topology.parameters[potential.type].exclusion_scale_idxs
-        ]
-        exclusion_scales = torch.broadcast_to(
-            exclusion_scales, (n_copies, *exclusion_scales.shape)
+        system_idxs[system_slice].view(n_copies, len(exclusion_idxs), 2)[:] = (
+            particle_offset[:, None, None] + exclusion_idxs[None, :, :]
+        )
+        system_scales[system_slice].view(n_copies, len(exclusion_idxs))[:] = (
+            potential.attributes[
+                topology.parameters[potential.type].exclusion_scale_idxs
+            ].reshape(1, -1)
         )
 
-        per_topology_exclusion_idxs.append(exclusion_idxs.reshape(-1, 2))
-        per_topology_exclusion_scales.append(exclusion_scales.reshape(-1))
+    return system_idxs, system_scales
 
-    system_idxs = (
-        torch.zeros((0, 2), dtype=torch.int32)
-        if len(per_topology_exclusion_idxs) == 0
-        else torch.vstack(per_topology_exclusion_idxs)
-    )
-    system_scales = (
-        torch.zeros((0,), dtype=torch.float32)
-        if len(per_topology_exclusion_scales) == 0
-        else torch.cat(per_topology_exclusion_scales)
-    )
 
-    return system_idxs, system_scales
+def _broadcast_exclusion_pair_idxs(
+    system: smee.TensorSystem, potential: smee.TensorPotential
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """Broadcasts the exclusions of each topology to the full system, returning the
+    index of each exclusion in the flattened upper triangular matrix of all pairs of
+    particles with ``shape=(n_exclusions,)`` and its scale factor with
+    ``shape=(n_exclusions,)``."""
+
+    if len(system.topologies) == 1 and system.n_copies[0] == 1:
+        # the pair indices of the exclusions of a single topology can be cached
+        parameter_map = system.topologies[0].parameters[potential.type]
+
+        exclusion_scales = potential.attributes[parameter_map.exclusion_scale_idxs]
+        return parameter_map.exclusions_upper_tri_idx, exclusion_scales.reshape(-1)
+
+    exclusion_idxs, exclusion_scales = _broadcast_exclusions(system, potential)
+
+    if len(exclusion_idxs) == 0:
+        return exclusion_idxs[:, 0], exclusion_scales
+
+    exclusion_idxs, _ = exclusion_idxs.long().sort(dim=1)  # ensure upper triangle
+
+    exclusion_idxs = smee.utils.to_upper_tri_idx(
+        exclusion_idxs[:, 0], exclusion_idxs[:, 1], system.n_particles
+    )
+    return exclusion_idxs, exclusion_scales
 
 
 def compute_pairwise_scales(
@@ -112,29 +154,74 @@ def compute_pairwise_scales(
     n_particles = system.n_particles
     n_pairs = (n_particles * (n_particles - 1)) // 2
 
-    exclusion_idxs, exclusion_scales = _broadcast_exclusions(system, potential)
-
     pair_scales = smee.utils.ones_like(n_pairs, other=potential.parameters)
 
-    if len(exclusion_idxs) > 0:
-        exclusion_idxs, _ = exclusion_idxs.sort(dim=1)  # ensure upper triangle
+    exclusion_idxs, exclusion_scales = _broadcast_exclusion_pair_idxs(system, potential)
 
-        pair_idxs = smee.utils.to_upper_tri_idx(
-            exclusion_idxs[:, 0], exclusion_idxs[:, 1], n_particles
-        )
-        pair_scales[pair_idxs] = exclusion_scales
+    if len(exclusion_idxs) > 0:
+        pair_scales[exclusion_idxs] = exclusion_scales
 
     return pair_scales
 
 
-def _compute_pairwise_periodic(
-    conformer: torch.Tensor, box_vectors: torch.Tensor, cutoff: torch.Tensor
+def _compute_pair_scales(
+    system: smee.TensorSystem,
+    potential: smee.TensorPotential,
+    pairwise: PairwiseDistances,
+) -> torch.Tensor:
+    """Returns the scale factor of each pair of particles in ``pairwise``.
+
+    Args:
+        system: The system.
+        potential: The potential containing the scale factors to broadcast.
+        pairwise: The pairs of particles to return the scale factors of.
+
+    Returns:
+        The scale factor of each pair with ``shape=(n_pairs,)``.
+    """
+    n_particles = system.n_particles
+    n_pairs = (n_particles * (n_particles - 1)) // 2
+
+    if pairwise.all_pairs and len(pairwise.idxs) == n_pairs:
+        # all pairs are present and already in upper triangular order
+        return compute_pairwise_scales(system, potential)
+
+    pair_scales = smee.utils.ones_like(len(pairwise.idxs), other=potential.parameters)
+
+    exclusion_idxs, exclusion_scales = _broadcast_exclusion_pair_idxs(system, potential)
+
+    if len(exclusion_idxs) == 0 or len(pair_scales) == 0:
+        return pair_scales
+
+    # look up each pair in the (sorted) exclusions rather than scattering them into a
+    # dense ``(n_particles * (n_particles - 1) / 2,)`` tensor, which would be much
+    # larger than the number of pairs within the cutoff for large systems.
+    exclusion_idxs, exclusion_order = exclusion_idxs.long().sort()
+    exclusion_scales = exclusion_scales[exclusion_order]
+
+    # neighbor lists return int32 indices, which would overflow for large systems
+    pair_idxs = pairwise.idxs.long()
+    pair_idxs = smee.utils.to_upper_tri_idx(
+        pair_idxs[:, 0], pair_idxs[:, 1], n_particles
+    )
+
+    exclusion_positions = torch.searchsorted(exclusion_idxs, pair_idxs).clamp(
+        max=len(exclusion_idxs) - 1
+    )
+    is_excluded = exclusion_idxs[exclusion_positions] == pair_idxs
+
+    return torch.where(
+        is_excluded, exclusion_scales[exclusion_positions].to(pair_scales), pair_scales
+    )
+
+
+def _compute_pairwise_neighbors(
+    conformer: torch.Tensor, box_vectors: torch.Tensor | None, cutoff: torch.Tensor
 ) -> PairwiseDistances:
+    """Computes the distances between all pairs of particles within a cutoff using
+    a neighbor list, optionally applying PBC if box vectors are provided."""
     import NNPOps.neighbors
 
-    assert box_vectors is not None, "box vectors must be specified for PBC."
-    assert len(conformer.shape) == 2, "the conformer must not have a batch dimension."
-
     (
         pair_idxs,
         deltas,
@@ -151,18 +238,72 @@ def _compute_pairwise_periodic(
     return PairwiseDistances(pair_idxs.T.contiguous(), deltas, distances, cutoff)
 
 
-def _compute_pairwise_non_periodic(conformer: torch.Tensor) -> PairwiseDistances:
-    n_particles = conformer.shape[-2]
+def _compute_pairwise_periodic(
+    conformer: torch.Tensor, box_vectors: torch.Tensor, cutoff: torch.Tensor
+) -> PairwiseDistances:
+    assert box_vectors is not None, "box vectors must be specified for PBC."
+    assert len(conformer.shape) == 2, "the conformer must not have a batch dimension."
 
-    pair_idxs = torch.triu_indices(n_particles, n_particles, 1, dtype=torch.int32).T
+    return _compute_pairwise_neighbors(conformer, box_vectors, cutoff)
+
+
+@functools.lru_cache(maxsize=8)
+def _triu_pair_idxs(n_particles: int, device: torch.device) -> torch.Tensor:
+    """Returns the indices of each pair of particles in the upper triangle of an
+    ``n_particles x n_particles`` matrix (excluding the diagonal) with
+    ``shape=(n_pairs, 2)``.
+
+    Notes:
+        * The returned tensor is cached and shared between calls, and so must not be
+          modified in-place.
+        * Each cached tensor takes ``4 * n_particles * (n_particles - 1)`` bytes, e.g.
+          ~400 MB for 10,000 particles. Only the 8 most recently used tensors are
+          retained, and these can be freed by calling ``_triu_pair_idxs.cache_clear()``.
+    """
+    return torch.triu_indices(
+        n_particles, n_particles, 1, dtype=torch.int32, device=device
+    ).T.contiguous()
 
-    if conformer.ndim == 2:
-        deltas = conformer[pair_idxs[:, 1], :] - conformer[pair_idxs[:, 0], :]
-    else:
-        deltas = conformer[:, pair_idxs[:, 1], :] - conformer[:, pair_idxs[:, 0], :]
-    distances = deltas.norm(dim=-1)
 
-    return PairwiseDistances(pair_idxs.contiguous(), deltas, distances)
+def _compute_deltas(
+    conformer: torch.Tensor, idxs_a: torch.Tensor, idxs_b: torch.Tensor
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """Computes the vectors ``conformer[idxs_a] - conformer[idxs_b]`` with
+    ``shape=([n_confs,] n_pairs, 3)``, and their norms with
+    ``shape=([n_confs,] n_pairs)``, without applying PBC."""
+
+    if conformer.device.type == "cpu":
+        # on CPU gathering whole xyz records and reducing over the contiguous last
+        # dimension is much faster than reducing over the outer dimension of a SoA
+        # layout, and also out-performs padded AoSoA layouts.
+        deltas = conformer[..., idxs_a, :] - conformer[..., idxs_b, :]
+        return deltas, torch.linalg.vector_norm(deltas, dim=-1)
+
+    # gather from a (3, [n_confs,] n_particles) layout so that each coordinate is
+    # read contiguously, rather than gathering strided xyz records
+    conformer_soa = conformer.movedim(-1, 0).contiguous()
+
+    deltas_soa = conformer_soa[..., idxs_a] - conformer_soa[..., idxs_b]
+    return deltas_soa.movedim(0, -1), torch.linalg.vector_norm(deltas_soa, dim=0)
+
+
+def _compute_pairwise_non_periodic(
+    conformer: torch.Tensor, cutoff: torch.Tensor | None = None
+) -> PairwiseDistances:
+    if cutoff is not None:
+        if conformer.ndim != 2:
+            raise NotImplementedError(
+                "a non-periodic cutoff cannot be applied to batched conformers."
+            )
+
+        return _compute_pairwise_neighbors(conformer, None, cutoff)
+
+    n_particles = conformer.shape[-2]
+
+    pair_idxs = _triu_pair_idxs(n_particles, conformer.device)
+
+    deltas, distances = _compute_deltas(conformer, pair_idxs[:, 1], pair_idxs[:, 0])
+    return PairwiseDistances(pair_idxs, deltas, distances, all_pairs=True)
 
 
 def compute_pairwise(
@@ -170,11 +311,13 @@ def compute_pairwise(
     conformer: torch.Tensor,
     box_vectors: torch.Tensor | None,
     cutoff: torch.Tensor,
+    non_periodic_cutoff: torch.Tensor | None = None,
 ) -> PairwiseDistances:
     """Computes all pairwise distances between particles in the system.
 
     Notes:
-        If the system is not periodic, no cutoff and no PBC will be applied.
+        If the system is not periodic, no PBC will be applied, and a cutoff will only
+        be applied if ``non_periodic_cutoff`` is specified.
 
     Args:
         system: The system to compute the distances for.
@@ -183,6 +326,13 @@ def compute_pairwise(
         box_vectors: The box vectors [Å] of the system with ``shape=(n_confs3, 3)``
             or ``shape=(3, 3)`` if the system is periodic, or ``None`` otherwise.
         cutoff: The cutoff [Å] to apply for periodic systems.
+        non_periodic_cutoff: The cutoff [Å] to apply for non-periodic systems, or
+            ``None`` if all pairs of particles should be included. A neighbor list
+            will be used to find the pairs within the cutoff, and so the conformer
+            must not have a batch dimension. The neighbor list still returns a slot
+            for each of the ``n_particles * (n_particles - 1) / 2`` pairs before those
+            beyond the cutoff are removed, and so this reduces the cost of evaluating
+            the energy of each pair, but not the peak memory of finding them.
 
     Returns:
         The pairwise distances between each pair of particles within the cutoff.
@@ -190,7 +340,72 @@ def compute_pairwise(
     if system.is_periodic:
         return _compute_pairwise_periodic(conformer, box_vectors, cutoff)
     else:
-        return _compute_pairwise_non_periodic(conformer)
+        return _compute_pairwise_non_periodic(conformer, non_periodic_cutoff)
+
+
+def _get_non_periodic_cutoff(
+    potential: smee.TensorPotential,
+) -> torch.Tensor | None:
+    """Returns the cutoff to apply to a potential when evaluated for a non-periodic
+    system, or ``None`` if all pairs of particles should interact."""
+    if smee.NON_PERIODIC_CUTOFF_ATTRIBUTE not in potential.attribute_cols:
+        return None
+
+    return potential.attributes[
+        potential.attribute_cols.index(smee.NON_PERIODIC_CUTOFF_ATTRIBUTE)
+    ]
+
+
+def _requires_per_frame(
+    system: smee.TensorSystem,
+    potential: smee.TensorPotential,
+    conformer: torch.Tensor,
+    pairwise: PairwiseDistances | None,
+) -> bool:
+    """Returns whether a batch of conformers must be evaluated one frame at a time,
+    i.e. if a non-periodic cutoff is applied, as the neighbor list of each frame will
+    contain different pairs."""
+    return (
+        not system.is_periodic
+        and conformer.ndim == 3
+        and pairwise is None
+        and _get_non_periodic_cutoff(potential) is not None
+    )
+
+
+def _prepare_pairwise(
+    system: smee.TensorSystem,
+    potential: smee.TensorPotential,
+    conformer: torch.Tensor,
+    box_vectors: torch.Tensor | None,
+    pairwise: PairwiseDistances | None,
+) -> PairwiseDistances:
+    """Computes the pairwise distances required to evaluate a potential, or checks
+    that the pre-computed distances are consistent with it."""
+
+    cutoff = potential.attributes[potential.attribute_cols.index(smee.CUTOFF_ATTRIBUTE)]
+    non_periodic_cutoff = _get_non_periodic_cutoff(potential)
+
+    pairwise = (
+        pairwise
+        if pairwise is not None
+        else compute_pairwise(
+            system, conformer, box_vectors, cutoff, non_periodic_cutoff
+        )
+    )
+
+    if system.is_periodic and not torch.isclose(pairwise.cutoff, cutoff):
+        raise ValueError("the pairwise cutoff does not match the potential.")
+    if not system.is_periodic and (
+        (pairwise.cutoff is None) != (non_periodic_cutoff is None)
+        or (
+            non_periodic_cutoff is not None
+            and not torch.isclose(pairwise.cutoff, non_periodic_cutoff)
+        )
+    ):
+        raise ValueError("the pairwise cutoff does not match the potential.")
+
+    return pairwise
 
 
 def prepare_lrc_types(
@@ -210,17 +425,24 @@ def prepare_lrc_types(
         interactions with ``shape=(n_params,)``, and the numbers of ``ij`` interactions
         with ``shape=(len(idxs_i),)``.
     """
-    n_by_type = collections.defaultdict(int)
-
-    for topology, n_copies in zip(system.topologies, system.n_copies, strict=True):
-        parameter_counts = topology.parameters["vdW"].assignment_matrix.abs().sum(dim=0)
-
-        for key, count in zip(potential.parameter_keys, parameter_counts, strict=True):
-            n_by_type[key] += count.item() * n_copies
-
-    counts = smee.utils.tensor_like(
-        [n_by_type[key] for key in potential.parameter_keys], potential.parameters
-    )
+    if len(system.topologies) == 0:
+        counts = smee.utils.zeros_like(len(potential.parameters), potential.parameters)
+    else:
+        parameter_counts = [
+            topology.parameters["vdW"].assignment_matrix.abs().sum(dim=0)
+            for topology in system.topologies
+        ]
+        # the number of particles assigned each parameter with
+        # ``shape=(n_topologies, n_params)``
+        parameter_counts = torch.stack(
+            [
+                counts.to_dense() if counts.is_sparse else counts
+                for counts in parameter_counts
+            ]
+        ).to(potential.parameters)
+
+        n_copies = smee.utils.tensor_like(system.n_copies, parameter_counts)
+        counts = (parameter_counts * n_copies[:, None]).sum(dim=0)
 
     n_ii_interactions = (counts * (counts + 1.0)) / 2.0
 
@@ -266,6 +488,166 @@ def lorentz_berthelot(
     return smee.utils.geometric_mean(epsilon_a, epsilon_b), 0.5 * (sigma_a + sigma_b)
 
 
+class _ReducedPrecisionPow6(torch.autograd.Function):
+    """Evaluates ``(sigma / r)^6`` in a reduced precision, while computing its
+    gradients in the precision of the inputs, as the gradient of close pairs can
+    overflow the reduced precision well before the value itself does."""
+
+    generate_vmap_rule = True
+
+    @staticmethod
+    def forward(sigma, distances, pair_dtype):
+        energy_dtype = torch.result_type(sigma, distances)
+        return ((sigma.to(pair_dtype) / distances.to(pair_dtype)) ** 6).to(energy_dtype)
+
+    @staticmethod
+    def setup_context(ctx, inputs, output):
+        sigma, distances, _ = inputs
+        ctx.save_for_backward(sigma, distances)
+        ctx.save_for_forward(sigma, distances)
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        sigma, distances = ctx.saved_tensors
+
+        ratio = sigma / distances
+        grad_ratio = grad_output * 6.0 * ratio**5
+
+        grad_sigma = (grad_ratio / distances).sum_to_size(sigma.shape)
+        grad_distances = (-grad_ratio * ratio / distances).sum_to_size(distances.shape)
+
+        return grad_sigma, grad_distances, None
+
+    @staticmethod
+    def jvp(ctx, grad_sigma, grad_distances, _):
+        sigma, distances = ctx.saved_tensors
+
+        ratio = sigma / distances
+        return 6.0 * ratio**5 * (grad_sigma - ratio * grad_distances) / distances
+
+
+@smee.utils.compile_kernel
+def _compute_lj_pair_energy(
+    epsilon: torch.Tensor,
+    sigma: torch.Tensor,
+    distances: torch.Tensor,
+    pair_scales: torch.Tensor,
+    switch_fn: torch.Tensor | None,
+    pair_dtype: torch.dtype | None = None,
+) -> torch.Tensor:
+    """Sums the (scaled and switched) LJ energy of each pair of particles.
+
+    Args:
+        epsilon: The epsilon [kcal / mol] of each pair with ``shape=(n_pairs,)``.
+        sigma: The sigma [Å] of each pair with ``shape=(n_pairs,)``.
+        distances: The distance [Å] between each pair with
+            ``shape=(n_confs, n_pairs)`` or ``shape=(n_pairs,)``.
+        pair_scales: The scale factor of each pair with ``shape=(n_pairs,)``.
+        switch_fn: The value of the switching function for each pair, or ``None``
+            if no switching function should be applied.
+        pair_dtype: The reduced precision to evaluate ``(sigma / r)^6`` of each pair
+            in, or ``None`` to use the precision of the inputs.
+
+    Returns:
+        The total energy [kcal / mol].
+    """
+    energy_dtype = torch.result_type(epsilon, distances)
+
+    if pair_dtype is None:
+        x = (sigma / distances) ** 6
+    else:
+        # excluded (e.g. 1-2) pairs are close enough that their unscaled energy can
+        # overflow a reduced precision, giving ``0 * inf = nan``. Evaluate them at
+        # ``r = sigma`` instead, and only form ``x (x - 1)``, which can also overflow,
+        # after casting back.
+        distances = torch.where(pair_scales == 0.0, sigma, distances)
+        x = _ReducedPrecisionPow6.apply(sigma, distances, pair_dtype).to(energy_dtype)
+
+    energies = pair_scales * 4.0 * epsilon * (x * (x - 1.0))
+
+    if switch_fn is not None:
+        energies = energies * switch_fn
+
+    return energies.sum(-1)
+
+
+@smee.utils.compile_kernel
+def _compute_coulomb_pair_energy(
+    charges_a: torch.Tensor,
+    charges_b: torch.Tensor,
+    distances: torch.Tensor,
+    pair_scales: torch.Tensor,
+    pair_dtype: torch.dtype | None = None,
+) -> torch.Tensor:
+    """Sums the (scaled) Coulomb energy of each pair of particles.
+
+    Args:
+        charges_a: The charge [e] of the first particle in each pair with
+            ``shape=(n_pairs,)``.
+        charges_b: The charge [e] of the second particle in each pair with
+            ``shape=(n_pairs,)``.
+        distances: The distance [Å] between each pair with
+            ``shape=(n_confs, n_pairs)`` or ``shape=(n_pairs,)``.
+        pair_scales: The scale factor of each pair with ``shape=(n_pairs,)``.
+        pair_dtype: The reduced precision to evaluate the energy of each pair in, or
+            ``None`` to use the precision of the inputs.
+
+    Returns:
+        The total energy [kcal / mol].
+    """
+    energy_dtype = torch.result_type(charges_a, distances)
+
+    if pair_dtype is not None:
+        charges_a, charges_b = charges_a.to(pair_dtype), charges_b.to(pair_dtype)
+        distances, pair_scales = distances.to(pair_dtype), pair_scales.to(pair_dtype)
+
+    energies = _COULOMB_PRE_FACTOR * pair_scales * charges_a * charges_b / distances
+    return energies.to(energy_dtype).sum(-1)
+
+
+def _get_pair_dtype(potential: smee.TensorPotential) -> torch.dtype | None:
+    """Returns the reduced precision dtype that the energy of each pair of particles
+    should be evaluated in, if any."""
+    if potential.pair_precision is None:
+        return None
+
+    return {"bfloat16": torch.bfloat16, "float16": torch.float16}[
+        potential.pair_precision
+    ]
+
+
+def _lorentz_berthelot_pairs(
+    epsilon: torch.Tensor, sigma: torch.Tensor, pair_idxs: torch.Tensor
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """Applies the Lorentz-Berthelot combination rules to each pair of particles.
+
+    Notes:
+        This is equivalent to ``lorentz_berthelot``, but the square root and halving
+        are applied once per particle rather than once per pair. The gradients with
+        respect to epsilon match those of ``lorentz_berthelot``, including when it is
+        zero.
+
+    Args:
+        epsilon: The epsilon [kcal / mol] of each particle with
+            ``shape=(n_particles,)``.
+        sigma: The sigma [Å] of each particle with ``shape=(n_particles,)``.
+        pair_idxs: The indices of each pair of particles with ``shape=(n_pairs, 2)``.
+
+    Returns:
+        The epsilon [kcal / mol] and sigma [Å] values of each pair, each with
+        ``shape=(n_pairs,)``.
+    """
+    sqrt_epsilon = smee.utils.safe_sqrt(epsilon)
+    half_sigma = 0.5 * sigma
+
+    return (
+        smee.utils.geometric_mean_sqrt(
+            sqrt_epsilon[pair_idxs[:, 0]], sqrt_epsilon[pair_idxs[:, 1]]
+        ),
+        half_sigma[pair_idxs[:, 0]] + half_sigma[pair_idxs[:, 1]],
+    )
+
+
 def _compute_switch_fn(
     potential: smee.TensorPotential,
     pairwise: PairwiseDistances,
@@ -276,20 +658,20 @@ def _compute_switch_fn(
     switch_width_idx = potential.attribute_cols.index(smee.SWITCH_ATTRIBUTE)
     switch_width = pairwise.cutoff - potential.attributes[switch_width_idx]
 
-    x_switch = (pairwise.distances - switch_width) / (pairwise.cutoff - switch_width)
-
-    switch_fn = 1.0 - 6.0 * x_switch**5 + 15.0 * x_switch**4 - 10.0 * x_switch**3
-
-    switch_fn = torch.where(
-        pairwise.distances < switch_width, torch.tensor(1.0), switch_fn
-    )
-    switch_fn = torch.where(
-        pairwise.distances > pairwise.cutoff, torch.tensor(0.0), switch_fn
+    # t = 1 - x where x = (r - rs) / (rc - rs), so that 1 - 6x^5 + 15x^4 - 10x^3 is
+    # t^3 (10 - 15t + 6t^2). Clamping t to [0, 1] yields 1 below the switching
+    # distance and 0 beyond the cutoff without needing any masks.
+    t = torch.clamp(
+        (pairwise.cutoff - pairwise.distances) / (pairwise.cutoff - switch_width),
+        0.0,
+        1.0,
     )
+    switch_fn = t * t * t * (10.0 - 15.0 * t + 6.0 * t * t)
 
     return switch_fn, switch_width
 
 
+@smee.utils.compile_kernel
 def _integrate_lj_switch(
     r: torch.Tensor,
     rs: torch.Tensor,
@@ -347,10 +729,29 @@ def _integrate_lj_switch(
     )
     coeff_11 = smee.utils.tensor_like([84, -3780, 7560, 2520, -3780, 756], rs) * coeff_0
 
-    r_pow = torch.pow(
-        r, smee.utils.tensor_like([-9, -8, -7, -6, -5, -4, -3, -2, -1, 0, 1, 2], rs)
+    # build r^-9 ... r^-1, log(r), r, r^2 from a short chain of multiplies rather
+    # than a general pow, with the log term in place of r^0
+    r_inv = 1.0 / r
+    r_inv2 = r_inv * r_inv
+    r_inv3 = r_inv2 * r_inv
+    r_inv6 = r_inv3 * r_inv3
+
+    r_pow = torch.stack(
+        [
+            r_inv6 * r_inv3,
+            r_inv6 * r_inv2,
+            r_inv6 * r_inv,
+            r_inv6,
+            r_inv3 * r_inv2,
+            r_inv2 * r_inv2,
+            r_inv3,
+            r_inv2,
+            r_inv,
+            torch.log(r),
+            r,
+            r * r,
+        ]
     )
-    r_pow[-3] = torch.log(r)
 
     integral = (
         -(b**3)
@@ -432,8 +833,10 @@ def compute_lj_energy(
     standard Lennard-Jones potential.
 
     Notes:
-        * No cutoff / switching function will be applied if the system is not
-          periodic.
+        * No switching function will be applied if the system is not periodic, and
+          a cutoff will only be applied if the potential has a
+          ``non_periodic_cutoff`` attribute, in which case each conformer in a batch
+          is evaluated separately.
         * A switching function will only be applied if the potential has a
           ``switch_width`` attribute.
 
@@ -454,33 +857,21 @@ def compute_lj_energy(
 
     box_vectors = None if not system.is_periodic else box_vectors
 
-    cutoff = potential.attributes[potential.attribute_cols.index(smee.CUTOFF_ATTRIBUTE)]
-
-    pairwise = (
-        pairwise
-        if pairwise is not None
-        else compute_pairwise(system, conformer, box_vectors, cutoff)
-    )
+    if _requires_per_frame(system, potential, conformer, pairwise):
+        return torch.stack(
+            [compute_lj_energy(system, potential, frame) for frame in conformer]
+        )
 
-    if system.is_periodic and not torch.isclose(pairwise.cutoff, cutoff):
-        raise ValueError("the pairwise cutoff does not match the potential.")
+    pairwise = _prepare_pairwise(system, potential, conformer, box_vectors, pairwise)
 
     parameters = smee.potentials.broadcast_parameters(system, potential)
-    pair_scales = compute_pairwise_scales(system, potential)
-
-    pairs_1d = smee.utils.to_upper_tri_idx(
-        pairwise.idxs[:, 0], pairwise.idxs[:, 1], len(parameters)
-    )
-    pair_scales = pair_scales[pairs_1d]
+    pair_scales = _compute_pair_scales(system, potential, pairwise)
 
     eps_column = potential.parameter_cols.index("epsilon")
     sig_column = potential.parameter_cols.index("sigma")
 
-    eps, sig = lorentz_berthelot(
-        parameters[pairwise.idxs[:, 0], eps_column],
-        parameters[pairwise.idxs[:, 1], eps_column],
-        parameters[pairwise.idxs[:, 0], sig_column],
-        parameters[pairwise.idxs[:, 1], sig_column],
+    eps, sig = _lorentz_berthelot_pairs(
+        parameters[:, eps_column], parameters[:, sig_column], pairwise.idxs
     )
 
     if potential.exceptions is not None:
@@ -493,16 +884,18 @@ def compute_lj_energy(
         eps[exception_idxs] = exceptions[:, eps_column]
         sig[exception_idxs] = exceptions[:, sig_column]
 
-    x = (sig / pairwise.distances) ** 6
-    energies = pair_scales * 4.0 * eps * (x * (x - 1.0))
+    pair_dtype = _get_pair_dtype(potential)
 
     if not system.is_periodic:
-        return energies.sum(-1)
+        return _compute_lj_pair_energy(
+            eps, sig, pairwise.distances, pair_scales, None, pair_dtype
+        )
 
     switch_fn, switch_width = _compute_switch_fn(potential, pairwise)
-    energies *= switch_fn
 
-    energy = energies.sum(-1)
+    energy = _compute_lj_pair_energy(
+        eps, sig, pairwise.distances, pair_scales, switch_fn, pair_dtype
+    )
     energy += _compute_lj_lrc(
         system,
         potential.to(precision="double"),
@@ -711,7 +1104,10 @@ def compute_dexp_energy(
     double-exponential potential.
 
     Notes:
-        * No cutoff function will be applied if the system is not periodic.
+        * No switching function will be applied if the system is not periodic, and
+          a cutoff will only be applied if the potential has a
+          ``non_periodic_cutoff`` attribute, in which case each conformer in a batch
+          is evaluated separately.
 
     Args:
         system: The system to compute the energy for.
@@ -728,33 +1124,21 @@ def compute_dexp_energy(
     """
     box_vectors = None if not system.is_periodic else box_vectors
 
-    cutoff = potential.attributes[potential.attribute_cols.index(smee.CUTOFF_ATTRIBUTE)]
-
-    pairwise = (
-        pairwise
-        if pairwise is not None
-        else compute_pairwise(system, conformer, box_vectors, cutoff)
-    )
+    if _requires_per_frame(system, potential, conformer, pairwise):
+        return torch.stack(
+            [compute_dexp_energy(system, potential, frame) for frame in conformer]
+        )
 
-    if system.is_periodic and not torch.isclose(pairwise.cutoff, cutoff):
-        raise ValueError("the pairwise cutoff does not match the potential.")
+    pairwise = _prepare_pairwise(system, potential, conformer, box_vectors, pairwise)
 
     parameters = smee.potentials.broadcast_parameters(system, potential)
-    pair_scales = compute_pairwise_scales(system, potential)
-
-    pairs_1d = smee.utils.to_upper_tri_idx(
-        pairwise.idxs[:, 0], pairwise.idxs[:, 1], len(parameters)
-    )
-    pair_scales = pair_scales[pairs_1d]
+    pair_scales = _compute_pair_scales(system, potential, pairwise)
 
     eps_column = potential.parameter_cols.index("epsilon")
     r_min_column = potential.parameter_cols.index("r_min")
 
-    eps, r_min = smee.potentials.nonbonded.lorentz_berthelot(
-        parameters[pairwise.idxs[:, 0], eps_column],
-        parameters[pairwise.idxs[:, 1], eps_column],
-        parameters[pairwise.idxs[:, 0], r_min_column],
-        parameters[pairwise.idxs[:, 1], r_min_column],
+    eps, r_min = _lorentz_berthelot_pairs(
+        parameters[:, eps_column], parameters[:, r_min_column], pairwise.idxs
     )
 
     if potential.exceptions is not None:
@@ -810,54 +1194,60 @@ def _compute_pme_exclusions(
         ``max_exclusions`` is the maximum number of exclusions of any atom. A value
         of -1 is used for padding.
     """
-    exclusion_templates = [
-        [[] for _ in range(topology.n_particles)] for topology in system.topologies
-    ]
+    per_topology_partners = []
     max_exclusions = 0
 
-    for exclusions, topology in zip(
-        exclusion_templates, system.topologies, strict=True
-    ):
-        for i, j in topology.parameters[potential.type].exclusions:
-            exclusions[i].append(int(j))
-            exclusions[j].append(int(i))
+    for topology in system.topologies:
+        exclusions = topology.parameters[potential.type].exclusions.long()
 
-            max_exclusions = max(len(exclusions[i]), max_exclusions)
-            max_exclusions = max(len(exclusions[j]), max_exclusions)
+        # each exclusion (i, j) adds j to the list of i and i to the list of j, in the
+        # order the exclusions are defined
+        idxs = exclusions.flatten()
+        partner_idxs = exclusions.flip(-1).flatten()
 
-    idx_offset = 0
+        order = torch.argsort(idxs, stable=True)
+        idxs, partner_idxs = idxs[order], partner_idxs[order]
 
-    exclusions_per_type = []
+        counts = torch.bincount(idxs, minlength=topology.n_particles)
+        starts = torch.cumsum(counts, dim=0) - counts
 
-    for exclusions, topology, n_copies in zip(
-        exclusion_templates, system.topologies, system.n_copies, strict=True
-    ):
-        for atom_exclusions in exclusions:
-            n_padding = max_exclusions - len(atom_exclusions)
-            atom_exclusions.extend([-1] * n_padding)
+        slots = torch.arange(len(idxs), device=idxs.device) - starts[idxs]
 
-        exclusions = torch.tensor(exclusions, dtype=torch.int32)
+        per_topology_partners.append((idxs, slots, partner_idxs))
+        if len(counts) > 0:
+            max_exclusions = max(max_exclusions, int(counts.max()))
 
-        exclusion_offset = idx_offset + torch.arange(n_copies) * topology.n_particles
-        idx_offset += n_copies * topology.n_particles
+    if max_exclusions == 0:
+        return torch.zeros((0, 0), dtype=torch.int32)
 
-        if exclusions.shape[-1] == 0:
-            continue
+    n_particles = sum(
+        n_copies * topology.n_particles
+        for topology, n_copies in zip(system.topologies, system.n_copies, strict=True)
+    )
+    device = per_topology_partners[0][0].device
 
-        exclusions = torch.broadcast_to(
-            exclusions, (n_copies, len(exclusions), max_exclusions)
-        )
-        exclusions = torch.where(
-            exclusions >= 0, exclusions + exclusion_offset[:, None, None], exclusions
+    system_exclusions = torch.full(
+        (n_particles, max_exclusions), -1, dtype=torch.int32, device=device
+    )
+
+    idx_offset = 0
+
+    for (idxs, slots, partner_idxs), topology, n_copies in zip(
+        per_topology_partners, system.topologies, system.n_copies, strict=True
+    ):
+        exclusion_offset = (
+            idx_offset + torch.arange(n_copies, device=device) * topology.n_particles
         )
+        exclusions = system_exclusions[
+            idx_offset : idx_offset + n_copies * topology.n_particles
+        ].view(n_copies, topology.n_particles, max_exclusions)
+        idx_offset += n_copies * topology.n_particles
 
-        exclusions_per_type.append(exclusions.reshape(-1, max_exclusions))
+        exclusions[:, idxs, slots] = (
+            partner_idxs[None, :] + exclusion_offset[:, None]
+        ).int()
 
-    return (
-        torch.zeros((0, 0), dtype=torch.int32)
-        if len(exclusions_per_type) == 0
-        else torch.vstack(exclusions_per_type)
-    )
+    return system_exclusions
 
 
 def _compute_pme_grid(
@@ -880,17 +1270,73 @@ def _compute_coulomb_energy_non_periodic(
     pairwise: PairwiseDistances,
 ):
     parameters = smee.potentials.broadcast_parameters(system, potential)
-    pair_scales = compute_pairwise_scales(system, potential)
+    pair_scales = _compute_pair_scales(system, potential, pairwise)
 
-    energy = (
+    return _compute_coulomb_pair_energy(
+        parameters[pairwise.idxs[:, 0], 0],
+        parameters[pairwise.idxs[:, 1], 0],
+        pairwise.distances,
+        pair_scales,
+        _get_pair_dtype(potential),
+    )
+
+
+@torch.compiler.disable
+def _compute_pme_exclusion_coeffs(
+    system: smee.TensorSystem, potential: smee.TensorPotential, charges: torch.Tensor
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """Computes the coefficient of ``1 / r`` of the correction to the PME energy of
+    each excluded pair of particles.
+
+    Notes:
+        If the charges do not require gradients, the coefficients are cached on the
+        potential and re-used until the system or the parameters / attributes of the
+        potential are replaced or modified in-place. This is run eagerly, as the
+        in-place modification of tensors is not guarded on by ``torch.compile``.
+
+    Args:
+        system: The system.
+        potential: The potential containing the scale factors to broadcast.
+        charges: The charge [e] of each particle with ``shape=(n_particles,)``.
+
+    Returns:
+        The indices of each excluded pair with ``shape=(n_exclusions, 2)`` and the
+        coefficients [kcal / mol Å] with ``shape=(n_exclusions,)``.
+    """
+    # the objects the coefficients were computed from, which are compared by identity,
+    # and the values (e.g. in-place versions) that they must still have
+    ref_key = (system, potential.parameters, potential.attributes, *system.topologies)
+    value_key = (
+        tuple(system.n_copies),
+        potential.parameters._version,
+        potential.attributes._version,
+    )
+
+    cached = potential._pme_exclusion_coeffs
+
+    if (
+        not charges.requires_grad
+        and cached is not None
+        and len(cached[0]) == len(ref_key)
+        and all(a is b for a, b in zip(cached[0], ref_key, strict=True))
+        and cached[1] == value_key
+    ):
+        return cached[2], cached[3]
+
+    exclusion_idxs, exclusion_scales = _broadcast_exclusions(system, potential)
+    exclusion_coeffs = (
         _COULOMB_PRE_FACTOR
-        * pair_scales
-        * parameters[pairwise.idxs[:, 0], 0]
-        * parameters[pairwise.idxs[:, 1], 0]
-        / pairwise.distances
-    ).sum(-1)
+        * exclusion_scales
+        * charges[exclusion_idxs[:, 0]]
+        * charges[exclusion_idxs[:, 1]]
+    )
 
-    return energy
+    potential._pme_exclusion_coeffs = (
+        None
+        if charges.requires_grad
+        else (ref_key, value_key, exclusion_idxs, exclusion_coeffs)
+    )
+    return exclusion_idxs, exclusion_coeffs
 
 
 def _compute_coulomb_energy_periodic(
@@ -917,9 +1363,14 @@ def _compute_coulomb_energy_periodic(
         grid_x, grid_y, grid_z, _PME_ORDER, alpha, _COULOMB_PRE_FACTOR, exceptions
     )
 
+    # the NNPOps ops only support single precision. The conformer and box vectors are
+    # already cast by ``compute_coulomb_energy``, but the charges may be in double
+    # precision
+    charges_pme = charges if charges.dtype == torch.float32 else charges.float()
+
     energy_direct = torch.ops.pme.pme_direct(
-        conformer.float(),
-        charges.float(),
+        conformer,
+        charges_pme,
         pairwise.idxs.T,
         pairwise.deltas,
         pairwise.distances,
@@ -929,9 +1380,9 @@ def _compute_coulomb_energy_periodic(
     )
     energy_self = -torch.sum(charges**2) * pme.coulomb * pme.alpha / math.sqrt(torch.pi)
     energy_recip = energy_self + torch.ops.pme.pme_reciprocal(
-        conformer.float(),
-        charges.float(),
-        box_vectors.float(),
+        conformer,
+        charges_pme,
+        box_vectors,
         pme.gridx,
         pme.gridy,
         pme.gridz,
@@ -943,19 +1394,14 @@ def _compute_coulomb_energy_periodic(
         pme.moduli[2].to(charges.device),
     )
 
-    exclusion_idxs, exclusion_scales = _broadcast_exclusions(system, potential)
+    exclusion_idxs, exclusion_coeffs = _compute_pme_exclusion_coeffs(
+        system, potential, charges
+    )
+    _, exclusion_distances = _compute_deltas(
+        conformer, exclusion_idxs[:, 0], exclusion_idxs[:, 1]
+    )
 
-    exclusion_distances = (
-        conformer[exclusion_idxs[:, 0], :] - conformer[exclusion_idxs[:, 1], :]
-    ).norm(dim=-1)
-
-    energy_exclusion = (
-        _COULOMB_PRE_FACTOR
-        * exclusion_scales
-        * charges[exclusion_idxs[:, 0]]
-        * charges[exclusion_idxs[:, 1]]
-        / exclusion_distances
-    ).sum(-1)
+    energy_exclusion = (exclusion_coeffs / exclusion_distances).sum(-1)
 
     return energy_direct + energy_recip + energy_exclusion
 
@@ -974,7 +1420,9 @@ def compute_coulomb_energy(
     using the Coulomb potential.
 
     Notes:
-        * No cutoff will be applied if the system is not periodic.
+        * A cutoff will only be applied to non-periodic systems if the potential
+          has a ``non_periodic_cutoff`` attribute, in which case each conformer in a
+          batch is evaluated separately.
         * PME will be used to compute the energy if the system is periodic.
 
     Args:
@@ -994,16 +1442,20 @@ def compute_coulomb_energy(
 
     box_vectors = None if not system.is_periodic else box_vectors
 
-    cutoff = potential.attributes[potential.attribute_cols.index(smee.CUTOFF_ATTRIBUTE)]
-
-    pairwise = (
-        pairwise
-        if pairwise is not None
-        else compute_pairwise(system, conformer, box_vectors, cutoff)
-    )
+    if _requires_per_frame(system, potential, conformer, pairwise):
+        return torch.stack(
+            [compute_coulomb_energy(system, potential, frame) for frame in conformer]
+        )
 
-    if system.is_periodic and not torch.isclose(pairwise.cutoff, cutoff):
-        raise ValueError("the distance cutoff does not match the potential.")
+    if system.is_periodic:
+        # the NNPOps PME ops only support single precision. This is a no-op when
+        # called by ``compute_energy``, which has already cast the inputs.
+        if conformer.dtype != torch.float32:
+            conformer = conformer.float()
+        if box_vectors is not None and box_vectors.dtype != torch.float32:
+            box_vectors = box_vectors.float()
+
+    pairwise = _prepare_pairwise(system, potential, conformer, box_vectors, pairwise)
 
     if potential.exceptions is not None:
         raise NotImplementedError("exceptions are not supported for charges.")
@@ -2,6 +2,7 @@ import copy
 import math
 
 import numpy
+import openff.units
 import openmm.unit
 import pytest
 import torch
@@ -14,9 +15,16 @@ import smee.tests.utils
 import smee.utils
 from smee.potentials.nonbonded import (
     _COULOMB_PRE_FACTOR,
+    PairwiseDistances,
+    _broadcast_exclusions,
     _compute_dexp_lrc,
     _compute_lj_lrc,
+    _compute_lj_pair_energy,
+    _compute_pair_scales,
+    _compute_pme_exclusion_coeffs,
     _compute_pme_exclusions,
+    _lorentz_berthelot_pairs,
+    _triu_pair_idxs,
     compute_coulomb_energy,
     compute_dexp_energy,
     compute_lj_energy,
@@ -112,6 +120,107 @@ def test_compute_pairwise_scales():
     assert torch.allclose(scales, expected_scales)
 
 
+@pytest.mark.parametrize("n_copies", [[0, 3], [2, 0]])
+def test_compute_pairwise_scales_zero_copies(n_copies):
+    system, force_field = smee.tests.utils.system_from_smiles(["C", "O"], [2, 3])
+    system.n_copies = n_copies
+
+    expected_system = smee.TensorSystem(
+        [
+            topology
+            for topology, n in zip(system.topologies, n_copies, strict=True)
+            if n > 0
+        ],
+        [n for n in n_copies if n > 0],
+        False,
+    )
+
+    vdw_potential = force_field.potentials_by_type["vdW"]
+
+    scales = compute_pairwise_scales(system, vdw_potential)
+    expected_scales = compute_pairwise_scales(expected_system, vdw_potential)
+
+    assert scales.shape == expected_scales.shape
+    assert torch.allclose(scales, expected_scales)
+
+
+def test_compute_pair_scales():
+    system, force_field = smee.tests.utils.system_from_smiles(["C", "O"], [2, 3])
+
+    vdw_potential = force_field.potentials_by_type["vdW"]
+    vdw_potential.attributes = torch.tensor(
+        [0.01, 0.02, 0.5, 1.0, 9.0, 2.0], dtype=torch.float64
+    )
+
+    # the pairs returned by a neighbour list, which are not in upper triangular order
+    pair_idxs = torch.tensor([[5, 7], [0, 1], [2, 10], [14, 15], [0, 5], [6, 8]])
+    pairwise = PairwiseDistances(
+        pair_idxs, torch.zeros((len(pair_idxs), 3)), torch.ones(len(pair_idxs))
+    )
+
+    scales = _compute_pair_scales(system, vdw_potential, pairwise)
+
+    expected_scales = torch.tensor(
+        [0.01, 0.01, 1.0, 0.02, 1.0, 0.02], dtype=torch.float64
+    )
+    assert scales.shape == expected_scales.shape
+    assert torch.allclose(scales, expected_scales)
+
+
+def test_compute_pair_scales_dense():
+    system, force_field = smee.tests.utils.system_from_smiles(["C", "O"], [2, 3])
+    coords = torch.randn((system.n_particles, 3))
+
+    vdw_potential = force_field.potentials_by_type["vdW"]
+
+    pairwise = compute_pairwise(system, coords, None, torch.tensor(9.0))
+    scales = _compute_pair_scales(system, vdw_potential, pairwise)
+
+    assert torch.allclose(scales, compute_pairwise_scales(system, vdw_potential))
+
+
+def test_compute_pair_scales_large_system():
+    # the flattened upper triangular index of these pairs overflows int32
+    n_copies = 20000
+
+    parameter_map = smee.NonbondedParameterMap(
+        torch.eye(3).to_sparse(),
+        torch.tensor([[0, 1], [1, 2]]),
+        torch.tensor([[0]] * 2),
+    )
+    topology = smee.TensorTopology(
+        atomic_nums=torch.tensor([8, 1, 1]),
+        formal_charges=torch.zeros(3),
+        bond_idxs=torch.tensor([[0, 1], [1, 2]]),
+        bond_orders=torch.ones(2),
+        parameters={"vdW": parameter_map},
+    )
+    system = smee.TensorSystem([topology], [n_copies], True)
+
+    vdw_potential = smee.TensorPotential(
+        type="vdW",
+        fn=smee.EnergyFn.VDW_LJ,
+        parameters=torch.ones((3, 2)),
+        parameter_keys=[None] * 3,
+        parameter_cols=("epsilon", "sigma"),
+        parameter_units=(None, None),
+        attributes=torch.tensor([0.0]),
+        attribute_cols=("scale_12",),
+        attribute_units=(None,),
+    )
+
+    pair_idxs = torch.tensor(
+        [[59997, 59998], [59990, 59995], [0, 1], [59998, 59999]], dtype=torch.int32
+    )
+    pairwise = PairwiseDistances(
+        pair_idxs, torch.zeros((4, 3)), torch.ones(4), torch.tensor(9.0)
+    )
+
+    scales = _compute_pair_scales(system, vdw_potential, pairwise)
+
+    assert torch.allclose(scales, torch.tensor([0.0, 1.0, 0.0, 0.0]))
+
+
 def test_compute_pairwise_periodic():
     system = smee.TensorSystem(
         [
@@ -222,6 +331,212 @@ def test_compute_pairwise_non_periodic(with_batch):
     assert pairwise.cutoff is None
 
 
+def test_triu_pair_idxs():
+    pair_idxs = _triu_pair_idxs(4, torch.device("cpu"))
+
+    expected_idxs = torch.tensor(
+        [[0, 1], [0, 2], [0, 3], [1, 2], [1, 3], [2, 3]], dtype=torch.int32
+    )
+    assert torch.equal(pair_idxs, expected_idxs)
+
+    assert _triu_pair_idxs(4, torch.device("cpu")) is pair_idxs
+
+    _triu_pair_idxs.cache_clear()
+    assert _triu_pair_idxs(4, torch.device("cpu")) is not pair_idxs
+
+
+def test_compute_pairwise_non_periodic_cutoff():
+    system = smee.TensorSystem(
+        [
+            smee.tests.utils.topology_from_smiles("[Ar]"),
+            smee.tests.utils.topology_from_smiles("[Ne]"),
+        ],
+        [2, 3],
+        False,
+    )
+
+    coords = torch.tensor(
+        [
+            [+0.0, 0.0, 0.0],
+            [-4.0, 0.0, 0.0],
+            [+4.0, 0.0, 0.0],
+            [-8.0, 0.0, 0.0],
+            [+8.0, 0.0, 0.0],
+        ]
+    )
+    cutoff = torch.tensor(9.0)
+
+    pairwise = compute_pairwise(system, coords, None, torch.tensor(12.0), cutoff)
+
+    expected_idxs = torch.tensor(
+        [[0, 1], [0, 2], [0, 3], [0, 4], [1, 2], [1, 3], [2, 4]], dtype=torch.int32
+    )
+    expected_distances = torch.tensor([4.0, 4.0, 8.0, 8.0, 8.0, 4.0, 4.0])
+
+    n_expected_pairs = len(expected_idxs)
+
+    assert pairwise.idxs.shape == (n_expected_pairs, 2)
+    assert pairwise.idxs.dtype == torch.int32
+
+    pairs_1d = smee.utils.to_upper_tri_idx(
+        pairwise.idxs[:, 0], pairwise.idxs[:, 1], system.n_particles
+    )
+    order = pairs_1d.argsort()
+
+    assert torch.allclose(pairwise.idxs[order], expected_idxs)
+    assert torch.allclose(pairwise.distances[order], expected_distances)
+
+    assert torch.isclose(cutoff, pairwise.cutoff)
+
+    with pytest.raises(NotImplementedError, match="batched conformers"):
+        compute_pairwise(system, coords.unsqueeze(0), None, cutoff, cutoff)
+
+
+def _add_non_periodic_cutoff(potential: smee.TensorPotential, cutoff: float):
+    potential.attributes = torch.cat(
+        [potential.attributes, torch.tensor([cutoff], dtype=potential.attributes.dtype)]
+    )
+    potential.attribute_cols = (
+        *potential.attribute_cols,
+        smee.NON_PERIODIC_CUTOFF_ATTRIBUTE,
+    )
+    potential.attribute_units = (
+        *potential.attribute_units,
+        openff.units.unit.angstrom,
+    )
+
+
+def _compute_truncated_energy(
+    system: smee.TensorSystem,
+    potential: smee.TensorPotential,
+    coords: torch.Tensor,
+    cutoff: float,
+) -> torch.Tensor:
+    """Sum the energy of each pair within a cutoff, assuming no exclusions."""
+    parameters = smee.potentials.broadcast_parameters(system, potential)
+
+    energy = torch.zeros(1, dtype=torch.float64)
+
+    for i in range(system.n_particles):
+        for j in range(i + 1, system.n_particles):
+            distance = torch.linalg.norm(coords[i] - coords[j]).double()
+
+            if distance > cutoff:
+                continue
+
+            if potential.type == "vdW":
+                eps_col = potential.parameter_cols.index("epsilon")
+                sig_col = potential.parameter_cols.index("sigma")
+
+                eps = torch.sqrt(parameters[i, eps_col] * parameters[j, eps_col])
+                sig = 0.5 * (parameters[i, sig_col] + parameters[j, sig_col])
+
+                energy += 4.0 * eps * ((sig / distance) ** 12 - (sig / distance) ** 6)
+            else:
+                energy += (
+                    _COULOMB_PRE_FACTOR * parameters[i, 0] * parameters[j, 0] / distance
+                )
+
+    return energy
+
+
+def test_lorentz_berthelot_pairs_zero_epsilon():
+    # e.g. the hydrogen of TIP3P water, which should have the same parameter
+    # gradients as when the mixing rules are applied to each pair
+    epsilon = torch.tensor([0.0, 0.1521, 0.0], requires_grad=True)
+    sigma = torch.tensor([1.0, 3.1507, 1.0], requires_grad=True)
+
+    pair_idxs = torch.tensor([[0, 1], [0, 2], [1, 2]])
+
+    eps, sig = _lorentz_berthelot_pairs(epsilon, sigma, pair_idxs)
+    grad_eps, grad_sig = torch.autograd.grad((eps * sig).sum(), (epsilon, sigma))
+
+    expected_eps, expected_sig = smee.potentials.nonbonded.lorentz_berthelot(
+        epsilon[pair_idxs[:, 0]],
+        epsilon[pair_idxs[:, 1]],
+        sigma[pair_idxs[:, 0]],
+        sigma[pair_idxs[:, 1]],
+    )
+    expected_grad_eps, expected_grad_sig = torch.autograd.grad(
+        (expected_eps * expected_sig).sum(), (epsilon, sigma)
+    )
+
+    assert torch.allclose(eps, expected_eps)
+    assert torch.allclose(sig, expected_sig)
+
+    assert torch.isfinite(grad_eps).all()
+    assert torch.allclose(grad_eps, expected_grad_eps)
+    assert torch.allclose(grad_sig, expected_grad_sig)
+
+
+@pytest.mark.parametrize(
+    "energy_fn,potential_type",
+    [(compute_lj_energy, "vdW"), (compute_coulomb_energy, "Electrostatics")],
+)
+def test_compute_xxx_energy_non_periodic_cutoff(energy_fn, potential_type):
+    system, force_field = smee.tests.utils.system_from_smiles(["[Ar]", "[Ne]"], [2, 3])
+    system.is_periodic = False
+
+    coords = torch.tensor(
+        [
+            [+0.0, 0.0, 0.0],
+            [-4.0, 0.0, 0.0],
+            [+4.0, 0.0, 0.0],
+            [-8.0, 0.0, 0.0],
+            [+8.0, 0.0, 0.0],
+        ]
+    )
+    cutoff = 6.0
+
+    potential = force_field.potentials_by_type[potential_type]
+
+    if potential_type == "Electrostatics":
+        # make sure that every pair contributes a non-zero energy
+        potential.parameters = 0.25 * torch.arange(
+            1, len(potential.parameters) + 1, dtype=potential.parameters.dtype
+        ).reshape(potential.parameters.shape)
+
+    _add_non_periodic_cutoff(potential, cutoff)
+
+    energy = energy_fn(system, potential, coords, None)
+    expected_energy = _compute_truncated_energy(system, potential, coords, cutoff)
+
+    assert torch.isclose(energy.double(), expected_energy, atol=1.0e-5)
+
+    # the pairs within the cutoff differ between each conformer in a batch
+    batched_coords = torch.stack([coords, 0.7 * coords])
+
+    batched_energy = energy_fn(system, potential, batched_coords, None)
+    expected_batched_energy = torch.cat(
+        [
+            _compute_truncated_energy(system, potential, frame, cutoff)
+            for frame in batched_coords
+        ]
+    )
+
+    assert batched_energy.shape == (2,)
+    assert torch.allclose(batched_energy.double(), expected_batched_energy, atol=1.0e-5)
+
+    other_cutoff = torch.tensor(9.0, dtype=potential.attributes.dtype)
+
+    with pytest.raises(ValueError, match="the pairwise cutoff does not match"):
+        energy_fn(
+            system,
+            potential,
+            coords,
+            None,
+            compute_pairwise(system, coords, None, other_cutoff, None),
+        )
+    with pytest.raises(ValueError, match="the pairwise cutoff does not match"):
+        energy_fn(
+            system,
+            potential,
+            coords,
+            None,
+            compute_pairwise(system, coords, None, other_cutoff, other_cutoff),
+        )
+
+
 @pytest.mark.parametrize("with_exceptions", [True, False])
 def test_prepare_lrc_types(with_exceptions):
     system, force_field = smee.tests.utils.system_from_smiles(["C", "O"], [2, 3])
@@ -374,6 +689,77 @@ def test_compute_xxx_energy_non_periodic(energy_fn, convert_fn, with_exceptions)
     assert torch.isclose(energy, expected_energy, atol=1.0e-5)
 
 
+@pytest.mark.parametrize("energy_fn", [compute_lj_energy, compute_coulomb_energy])
+@pytest.mark.parametrize("pair_precision", ["bfloat16", "float16"])
+def test_compute_xxx_energy_pair_precision(energy_fn, pair_precision):
+    tensor_sys, tensor_ff = smee.tests.utils.system_from_smiles(["CCC", "O"], [2, 3])
+    tensor_sys.is_periodic = False
+
+    coords, _ = smee.mm.generate_system_coords(tensor_sys, None)
+    coords = torch.tensor(coords.value_in_unit(openmm.unit.angstrom)).float()
+
+    potential_type = "vdW" if energy_fn == compute_lj_energy else "Electrostatics"
+    potential = tensor_ff.potentials_by_type[potential_type]
+
+    expected_energy = energy_fn(tensor_sys, potential, coords, None)
+
+    potential = copy.deepcopy(potential)
+    potential.pair_precision = pair_precision
+
+    energy = energy_fn(tensor_sys, potential, coords, None)
+
+    assert energy.dtype == expected_energy.dtype
+    assert torch.isfinite(energy).all()
+    assert torch.isclose(energy, expected_energy, rtol=1.0e-2, atol=1.0e-2)
+
+
+@pytest.mark.parametrize("pair_dtype", [torch.bfloat16, torch.float16])
+def test_compute_lj_pair_energy_pair_dtype_excluded(pair_dtype):
+    # an excluded C-H pair whose unscaled energy overflows float16
+    epsilon = torch.tensor([0.0157, 0.1])
+    sigma = torch.tensor([3.01, 3.0])
+    distances = torch.tensor([1.09, 3.5], requires_grad=True)
+    pair_scales = torch.tensor([0.0, 1.0])
+
+    expected_energy = _compute_lj_pair_energy(
+        epsilon, sigma, distances, pair_scales, None
+    )
+    energy = _compute_lj_pair_energy(
+        epsilon, sigma, distances, pair_scales, None, pair_dtype
+    )
+    (gradient,) = torch.autograd.grad(energy, distances)
+
+    assert torch.isfinite(energy)
+    assert torch.isfinite(gradient).all()
+    assert torch.isclose(energy, expected_energy, rtol=1.0e-2)
+
+
+@pytest.mark.parametrize("pair_dtype", [torch.bfloat16, torch.float16])
+def test_compute_lj_pair_energy_pair_dtype_close(pair_dtype):
+    # the gradient of non-excluded pairs this close overflows float16, even though
+    # their energy does not
+    epsilon = torch.full((4,), 0.1)
+    sigma = torch.full((4,), 3.4)
+    distances = torch.tensor([1.0, 1.2, 1.3, 3.5], requires_grad=True)
+    pair_scales = torch.ones(4)
+
+    expected_energy = _compute_lj_pair_energy(
+        epsilon, sigma, distances, pair_scales, None
+    )
+    (expected_gradient,) = torch.autograd.grad(expected_energy, distances)
+
+    energy = _compute_lj_pair_energy(
+        epsilon, sigma, distances, pair_scales, None, pair_dtype
+    )
+    (gradient,) = torch.autograd.grad(energy, distances)
+
+    assert torch.isfinite(energy)
+    assert torch.isfinite(gradient).all()
+
+    assert torch.isclose(energy, expected_energy, rtol=5.0e-2)
+    assert torch.allclose(gradient, expected_gradient, rtol=5.0e-2)
+
+
 def _expected_energy_lj_exceptions(params: dict[str, smee.tests.utils.LJParam]):
     sqrt_2 = math.sqrt(2)
 
@@ -498,6 +884,47 @@ def test_compute_pme_exclusions():
     assert torch.allclose(exclusions, expected_exclusions)
 
 
+def test_compute_pme_exclusion_coeffs_cached():
+    system, force_field = smee.tests.utils.system_from_smiles(["CO", "O"], [2, 3])
+
+    potential = force_field.potentials_by_type["Electrostatics"]
+    charges = smee.potentials.broadcast_parameters(system, potential).squeeze(-1)
+
+    exclusion_idxs, exclusion_scales = _broadcast_exclusions(system, potential)
+    expected_coeffs = (
+        _COULOMB_PRE_FACTOR
+        * exclusion_scales
+        * charges[exclusion_idxs[:, 0]]
+        * charges[exclusion_idxs[:, 1]]
+    )
+
+    idxs, coeffs = _compute_pme_exclusion_coeffs(system, potential, charges)
+    assert torch.equal(idxs, exclusion_idxs)
+    assert torch.allclose(coeffs, expected_coeffs)
+
+    assert _compute_pme_exclusion_coeffs(system, potential, charges)[1] is coeffs
+
+    # in-place changes to the parameters should invalidate the cache
+    potential.parameters *= 2.0
+    charges = smee.potentials.broadcast_parameters(system, potential).squeeze(-1)
+
+    idxs, coeffs_scaled = _compute_pme_exclusion_coeffs(system, potential, charges)
+    assert coeffs_scaled is not coeffs
+    assert torch.allclose(coeffs_scaled, 4.0 * expected_coeffs)
+
+    # the coefficients should never be cached when the charges require gradients
+    potential.parameters.requires_grad = True
+    charges = smee.potentials.broadcast_parameters(system, potential).squeeze(-1)
+
+    _, coeffs_grad = _compute_pme_exclusion_coeffs(system, potential, charges)
+    assert coeffs_grad.requires_grad
+    assert potential._pme_exclusion_coeffs is None
+
+    assert _compute_pme_exclusion_coeffs(system, potential, charges)[1] is not (
+        coeffs_grad
+    )
+
+
 def test_compute_coulomb_energy_periodic(etoh_water_system):
     tensor_sys, tensor_ff, coords, box_vectors = etoh_water_system
 
@@ -514,6 +941,22 @@ def test_compute_coulomb_energy_periodic(etoh_water_system):
     assert torch.isclose(energy, expected_energy, atol=1.0e-2)
 
 
+def test_compute_coulomb_energy_periodic_double(etoh_water_system):
+    tensor_sys, tensor_ff, coords, box_vectors = etoh_water_system
+
+    coulomb_potential = tensor_ff.potentials_by_type["Electrostatics"]
+
+    expected_energy = compute_coulomb_energy(
+        tensor_sys, coulomb_potential, coords.float(), box_vectors.float()
+    )
+    # the PME ops only support single precision, and so the inputs should be cast
+    energy = compute_coulomb_energy(
+        tensor_sys, coulomb_potential, coords.double(), box_vectors.double()
+    )
+
+    assert torch.isclose(energy, expected_energy)
+
+
 def test_compute_coulomb_energy_non_periodic():
     tensor_sys, tensor_ff = smee.tests.utils.system_from_smiles(["CCC", "O"], [2, 3])
     tensor_sys.is_periodic = False
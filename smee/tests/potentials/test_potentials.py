@@ -9,9 +9,19 @@ import pytest
 import torch
 
 import smee.converters
+import smee.mm
 import smee.tests.utils
 import smee.utils
-from smee.potentials import broadcast_exceptions, broadcast_parameters, compute_energy
+from smee.potentials import (
+    broadcast_exceptions,
+    broadcast_parameters,
+    compile_energy,
+    compute_energy,
+)
+from smee.potentials._potentials import (
+    _POTENTIAL_ENERGY_FN_KWARGS,
+    _precompute_pairwise,
+)
 
 
 def _place_v_sites(
@@ -69,6 +79,19 @@ def _compute_openmm_energy(
     return torch.tensor(energy)
 
 
+def test_potential_energy_fn_kwargs():
+    assert _POTENTIAL_ENERGY_FN_KWARGS[("vdW", smee.EnergyFn.VDW_LJ)] == frozenset(
+        {"box_vectors", "pairwise"}
+    )
+    assert _POTENTIAL_ENERGY_FN_KWARGS[("Bonds", smee.EnergyFn.BOND_HARMONIC)] == (
+        frozenset()
+    )
+
+    assert all(
+        isinstance(kwargs, frozenset) for kwargs in _POTENTIAL_ENERGY_FN_KWARGS.values()
+    )
+
+
 def test_broadcast_parameters():
     system, force_field = smee.tests.utils.system_from_smiles(["C", "O"], [2, 3])
     vdw_potential = force_field.potentials_by_type["vdW"]
@@ -232,3 +255,147 @@ def test_compute_energy_v_sites():
     energy_smee = compute_energy(tensor_top, tensor_ff, conformer)
 
     assert torch.isclose(energy_smee, energy_openmm.to(energy_smee.dtype))
+
+
+@pytest.mark.parametrize(
+    "vdw_cutoff, elec_cutoff, expected_cutoff, expected_computed",
+    [
+        (None, None, None, True),
+        (6.0, 6.0, 6.0, True),
+        (6.0, None, None, False),
+        (None, 6.0, None, False),
+        (6.0, 7.0, None, False),
+    ],
+)
+def test_precompute_pairwise_non_periodic_cutoff(
+    vdw_cutoff, elec_cutoff, expected_cutoff, expected_computed, mocker
+):
+    tensor_sys, tensor_ff = smee.tests.utils.system_from_smiles(["CCO", "O"], [2, 3])
+    tensor_sys.is_periodic = False
+
+    for potential_type, cutoff in [
+        ("vdW", vdw_cutoff),
+        ("Electrostatics", elec_cutoff),
+    ]:
+        if cutoff is None:
+            continue
+
+        potential = tensor_ff.potentials_by_type[potential_type]
+        potential.attributes = torch.cat(
+            [potential.attributes, torch.tensor([cutoff], dtype=torch.float64)]
+        )
+        potential.attribute_cols = (
+            *potential.attribute_cols,
+            smee.NON_PERIODIC_CUTOFF_ATTRIBUTE,
+        )
+        potential.attribute_units = (
+            *potential.attribute_units,
+            openff.units.unit.angstrom,
+        )
+
+    mock_compute_pairwise = mocker.patch(
+        "smee.potentials.nonbonded.compute_pairwise", autospec=True
+    )
+
+    coords = torch.zeros((tensor_sys.n_particles, 3))
+
+    pairwise_batched = _precompute_pairwise(
+        tensor_sys, tensor_ff, torch.stack([coords, coords]), None
+    )
+
+    # the pairs within a cutoff differ between frames, so these cannot be shared
+    expected_batched = expected_computed and expected_cutoff is None
+    assert (pairwise_batched is not None) == expected_batched
+
+    mock_compute_pairwise.reset_mock()
+
+    pairwise = _precompute_pairwise(tensor_sys, tensor_ff, coords, None)
+
+    if not expected_computed:
+        assert pairwise is None
+        mock_compute_pairwise.assert_not_called()
+        return
+
+    assert pairwise is mock_compute_pairwise.return_value
+    mock_compute_pairwise.assert_called_once()
+
+    non_periodic_cutoff = mock_compute_pairwise.call_args.args[-1]
+
+    if expected_cutoff is None:
+        assert non_periodic_cutoff is None
+    else:
+        assert torch.isclose(
+            non_periodic_cutoff, torch.tensor(expected_cutoff, dtype=torch.float64)
+        )
+
+
+@pytest.mark.parametrize("cuda_graphs", [False, True])
+def test_compile_energy(cuda_graphs):
+    tensor_sys, tensor_ff = smee.tests.utils.system_from_smiles(["CCO", "O"], [2, 3])
+    tensor_sys.is_periodic = False
+
+    coords, _ = smee.mm.generate_system_coords(tensor_sys, None)
+    coords = torch.tensor(coords.value_in_unit(openmm.unit.angstrom)).float()
+    coords.requires_grad = True
+
+    expected_energy = compute_energy(tensor_sys, tensor_ff, coords)
+    (expected_forces,) = torch.autograd.grad(expected_energy, coords)
+
+    energy_fn = compile_energy(tensor_sys, tensor_ff, cuda_graphs=cuda_graphs)
+
+    for _ in range(2):
+        energy = energy_fn(coords)
+        (forces,) = torch.autograd.grad(energy, coords)
+
+        assert energy.shape == expected_energy.shape
+        assert torch.allclose(energy, expected_energy, rtol=1.0e-4, atol=1.0e-4)
+        assert torch.allclose(forces, expected_forces, rtol=1.0e-4, atol=1.0e-4)
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="requires CUDA")
+def test_compile_energy_cuda_graphs():
+    tensor_sys, tensor_ff = smee.tests.utils.system_from_smiles(["CCO", "O"], [2, 3])
+    tensor_sys.is_periodic = False
+
+    coords, _ = smee.mm.generate_system_coords(tensor_sys, None)
+    coords = torch.tensor(coords.value_in_unit(openmm.unit.angstrom)).float()
+
+    tensor_sys, tensor_ff = tensor_sys.to("cuda"), tensor_ff.to("cuda")
+
+    conformers = [coords + 0.01 * i for i in range(3)]
+    conformers = [conformer.cuda().requires_grad_(True) for conformer in conformers]
+
+    expected_energies, expected_forces = [], []
+
+    for conformer in conformers:
+        energy = compute_energy(tensor_sys, tensor_ff, conformer)
+        (forces,) = torch.autograd.grad(energy, conformer)
+
+        expected_energies.append(energy.detach())
+        expected_forces.append(forces)
+
+    energy_fn = compile_energy(tensor_sys, tensor_ff, cuda_graphs=True)
+
+    energies, forces = [], []
+
+    # make sure that both the warm-up and replayed calls are correct
+    for _ in range(3):
+        for conformer in conformers:
+            energy = energy_fn(conformer)
+            (conformer_forces,) = torch.autograd.grad(energy, conformer)
+
+            # the outputs are overwritten by the next call, so keep copies
+            energies.append(energy.detach().clone())
+            forces.append(conformer_forces.clone())
+
+    for i, (energy, conformer_forces) in enumerate(zip(energies, forces, strict=True)):
+        expected_energy = expected_energies[i % len(conformers)]
+        expected_conformer_forces = expected_forces[i % len(conformers)]
+
+        assert energy.device.type == "cuda"
+
+        assert energy.shape == expected_energy.shape
+        assert torch.allclose(energy, expected_energy, rtol=1.0e-4, atol=1.0e-4)
+        assert torch.allclose(
+            conformer_forces, expected_conformer_forces, rtol=1.0e-4, atol=1.0e-4
+        )
@@ -27,6 +27,56 @@ def test_cast(tensor, precision, expected_device, expected_dtype):
     assert output.dtype == expected_dtype
 
 
+@pytest.mark.parametrize(
+    "assignment_matrix, expected_idxs",
+    [
+        (torch.tensor([[0.0, 1.0], [1.0, 0.0], [0.0, 1.0]]), [1, 0, 1]),
+        (torch.tensor([[0.0, 1.0], [1.0, 0.0], [0.0, 1.0]]).to_sparse(), [1, 0, 1]),
+        (torch.tensor([[0.0, 1.0], [1.0, -1.0]]).to_sparse(), None),
+        (torch.tensor([[0.0, 2.0], [1.0, 0.0]]).to_sparse(), None),
+        (torch.tensor([[0.0, 1.0], [0.0, 0.0]]).to_sparse(), None),
+    ],
+)
+def test_parameter_map_parameter_idxs(assignment_matrix, expected_idxs):
+    parameter_map = smee.NonbondedParameterMap(
+        assignment_matrix,
+        torch.zeros((0, 2), dtype=torch.int64),
+        torch.zeros((0, 1), dtype=torch.int64),
+    )
+
+    if expected_idxs is None:
+        assert parameter_map.parameter_idxs is None
+    else:
+        assert parameter_map.parameter_idxs.tolist() == expected_idxs
+
+
+def test_parameter_map_parameter_idxs_cache():
+    parameter_map = smee.ValenceParameterMap(
+        torch.tensor([[0, 1], [1, 2]]), torch.eye(2).to_sparse()
+    )
+    assert parameter_map.parameter_idxs.tolist() == [0, 1]
+
+    parameter_map.assignment_matrix = torch.eye(2).flip(0).to_sparse()
+    assert parameter_map.parameter_idxs.tolist() == [1, 0]
+
+
+def test_nonbonded_parameter_map_exclusions_upper_tri_idx():
+    parameter_map = smee.NonbondedParameterMap(
+        torch.eye(4).to_sparse(),
+        torch.tensor([[1, 0], [2, 3], [1, 3]]),
+        torch.tensor([[0], [0], [1]]),
+    )
+
+    # (0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)
+    exclusions_upper_tri_idx = parameter_map.exclusions_upper_tri_idx
+    assert exclusions_upper_tri_idx.tolist() == [0, 5, 4]
+
+    assert parameter_map.exclusions_upper_tri_idx is exclusions_upper_tri_idx
+
+    parameter_map.exclusions = torch.tensor([[0, 2]])
+    assert parameter_map.exclusions_upper_tri_idx.tolist() == [1]
+
+
 def _add_v_sites(topology: smee.TensorTopology):
     v_site_key = openff.interchange.models.VirtualSiteKey(
         orientation_atom_indices=(0,),
@@ -148,6 +148,18 @@ def test_find_exclusions_v_sites():
     }
 
 
+@pytest.mark.parametrize("value, expected_compiled", [("0", False), ("1", True)])
+def test_compile_kernel(value, expected_compiled, monkeypatch):
+    monkeypatch.setenv(smee.utils.COMPILE_ENV_VAR, value)
+
+    def kernel(x: torch.Tensor) -> torch.Tensor:
+        return x * 2.0
+
+    compiled = smee.utils.compile_kernel(kernel)
+
+    assert (compiled is not kernel) == expected_compiled
+
+
 def test_ones_like():
     expected_size = (4, 5)
     expected_type = torch.float16
@@ -312,3 +324,58 @@ def test_geometric_mean_zero(a, b, expected_grad_a, expected_grad_b):
 
     assert b.grad.shape == expected_grad_b.shape
     assert torch.allclose(b.grad, expected_grad_b)
+
+
+def test_geometric_mean_sqrt():
+    a = torch.tensor(2.0, requires_grad=True).double()
+    b = torch.tensor(3.0, requires_grad=True).double()
+
+    assert torch.autograd.gradcheck(
+        smee.utils.geometric_mean_sqrt,
+        (a, b),
+        check_backward_ad=True,
+        check_forward_ad=True,
+    )
+
+    assert torch.isclose(
+        smee.utils.geometric_mean_sqrt(a, b), torch.tensor(6.0).double()
+    )
+
+
+@pytest.mark.parametrize("a, b", [(0.0, 0.0), (3.0, 0.0), (0.0, 4.0), (9.0, 4.0)])
+def test_geometric_mean_sqrt_matches_geometric_mean(a, b):
+    a = torch.tensor(a, requires_grad=True)
+    b = torch.tensor(b, requires_grad=True)
+
+    expected_v = smee.utils.geometric_mean(a, b)
+    expected_grad_a, expected_grad_b = torch.autograd.grad(expected_v, (a, b))
+
+    v = smee.utils.geometric_mean_sqrt(smee.utils.safe_sqrt(a), smee.utils.safe_sqrt(b))
+    grad_a, grad_b = torch.autograd.grad(v, (a, b))
+
+    assert torch.isclose(v, expected_v)
+
+    assert torch.allclose(grad_a, expected_grad_a)
+    assert torch.allclose(grad_b, expected_grad_b)
+
+
+def test_safe_sqrt():
+    x = torch.tensor(4.0, requires_grad=True).double()
+
+    assert torch.autograd.gradcheck(
+        smee.utils.safe_sqrt, (x,), check_backward_ad=True, check_forward_ad=True
+    )
+
+    assert torch.isclose(smee.utils.safe_sqrt(x), torch.tensor(2.0).double())
+
+
+def test_safe_sqrt_zero():
+    x = torch.tensor(0.0, requires_grad=True)
+
+    v = smee.utils.safe_sqrt(x)
+    v.backward()
+
+    expected_grad = torch.tensor(1.0 / (2.0 * smee.utils.EPSILON))
+
+    assert torch.isfinite(x.grad)
+    assert torch.allclose(x.grad, expected_grad)
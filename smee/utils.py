@@ -1,5 +1,6 @@
 """General utility functions"""
 
+import os
 import typing
 
 import networkx
@@ -12,12 +13,19 @@ if typing.TYPE_CHECKING:
 
 _size = int | torch.Size | list[int] | tuple[int, ...]
 
+_T = typing.TypeVar("_T", bound=typing.Callable)
+
 ExclusionType = typing.Literal["scale_12", "scale_13", "scale_14", "scale_15"]
 
 
 EPSILON = 1.0e-6
 """A small epsilon value used to prevent divide by zero errors."""
 
+COMPILE_ENV_VAR = "SMEE_COMPILE"
+"""The environment variable that, when set to ``1``, enables compiling the
+element-wise energy kernels with ``torch.compile``. It is read when ``smee`` is first
+imported, and so must be set before then."""
+
 
 def find_exclusions(
     topology: openff.toolkit.Topology,
@@ -69,6 +77,32 @@ def find_exclusions(
     return exclusions
 
 
+def compile_kernel(fn: _T) -> _T:
+    """Wraps an element-wise tensor function with ``torch.compile`` if the
+    ``SMEE_COMPILE`` environment variable is set to ``1``.
+
+    Notes:
+        * Compilation is disabled by default as ``torch.compile`` does not support
+          double backward passes, e.g. when training against forces.
+        * The environment variable is read once when ``fn`` is decorated, i.e. when
+          the module defining it is imported, and so setting it afterwards has no
+          effect.
+
+    Args:
+        fn: The function to compile. It should return tensors, and accept tensors or
+            constant arguments such as ``None`` or a ``torch.dtype``, which are
+            specialized on rather than traced.
+
+    Returns:
+        The compiled function, or the original function if compilation is disabled.
+    """
+
+    if os.environ.get(COMPILE_ENV_VAR, "0") != "1":
+        return fn
+
+    return torch.compile(fn, dynamic=True, fullgraph=False)
+
+
 def ones_like(size: _size, other: torch.Tensor) -> torch.Tensor:
     """Create a tensor of ones with the same device and type as another tensor."""
     return torch.ones(size, dtype=other.dtype, device=other.device)
@@ -234,3 +268,100 @@ def geometric_mean(eps_a: torch.Tensor, eps_b: torch.Tensor) -> torch.Tensor:
     """
 
     return _SafeGeometricMean.apply(eps_a, eps_b)
+
+
+class _SafeSqrt(torch.autograd.Function):
+    generate_vmap_rule = True
+
+    @staticmethod
+    def forward(x):
+        return torch.sqrt(x)
+
+    @staticmethod
+    def setup_context(ctx, inputs, output):
+        ctx.save_for_backward(output)
+        ctx.save_for_forward(output)
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        (output,) = ctx.saved_tensors
+        output = torch.where(output == 0.0, EPSILON, output)
+
+        return grad_output / (2 * output)
+
+    @staticmethod
+    def jvp(ctx, grad_input):
+        (output,) = ctx.saved_tensors
+        output = torch.where(output == 0.0, EPSILON, output)
+
+        return grad_input / (2 * output)
+
+
+class _SafeGeometricMeanSqrt(torch.autograd.Function):
+    generate_vmap_rule = True
+
+    @staticmethod
+    def forward(sqrt_a, sqrt_b):
+        return sqrt_a * sqrt_b
+
+    @staticmethod
+    def setup_context(ctx, inputs, output):
+        sqrt_a, sqrt_b = inputs
+        eps = output
+        ctx.save_for_backward(sqrt_a, sqrt_b, eps)
+        ctx.save_for_forward(sqrt_a, sqrt_b, eps)
+
+    @staticmethod
+    def _grads(sqrt_a, sqrt_b, eps):
+        # chained with the gradient of ``safe_sqrt``, these yield the same gradients
+        # as ``geometric_mean``, i.e. ``eps_b / (2 * eps)``, including when eps is zero
+        eps = torch.where(eps == 0.0, EPSILON, eps)
+
+        grad_sqrt_a = sqrt_b**2 * torch.where(sqrt_a == 0.0, EPSILON, sqrt_a) / eps
+        grad_sqrt_b = sqrt_a**2 * torch.where(sqrt_b == 0.0, EPSILON, sqrt_b) / eps
+
+        return grad_sqrt_a, grad_sqrt_b
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        grad_sqrt_a, grad_sqrt_b = _SafeGeometricMeanSqrt._grads(*ctx.saved_tensors)
+        return grad_output * grad_sqrt_a, grad_output * grad_sqrt_b
+
+    @staticmethod
+    def jvp(ctx, *grad_inputs):
+        grad_sqrt_a, grad_sqrt_b = _SafeGeometricMeanSqrt._grads(*ctx.saved_tensors)
+        return grad_inputs[0] * grad_sqrt_a + grad_inputs[1] * grad_sqrt_b
+
+
+def geometric_mean_sqrt(sqrt_a: torch.Tensor, sqrt_b: torch.Tensor) -> torch.Tensor:
+    """Computes the geometric mean of two values from their square roots, e.g. when
+    the square roots have been computed once up front using ``safe_sqrt``.
+
+    The gradients with respect to the original values (i.e. through ``safe_sqrt``)
+    match those of ``geometric_mean``, including in cases where the mean is zero.
+
+    Args:
+        sqrt_a: The square root of the first value, computed using ``safe_sqrt``.
+        sqrt_b: The square root of the second value, computed using ``safe_sqrt``.
+
+    Returns:
+        The geometric mean of the two values.
+    """
+
+    return _SafeGeometricMeanSqrt.apply(sqrt_a, sqrt_b)
+
+
+def safe_sqrt(x: torch.Tensor) -> torch.Tensor:
+    """Computes the square root of a value 'safely'.
+
+    A small epsilon (``smee.utils.EPSILON``) is added when computing the gradient in
+    cases where the value is zero to prevent divide by zero errors.
+
+    Args:
+        x: The value.
+
+    Returns:
+        The square root of the value.
+    """
+
+    return _SafeSqrt.apply(x)